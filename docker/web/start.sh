@@ -11,6 +11,12 @@ python manage.py add_suppliers
 
 echo "Suppliers check completed"
 
+python manage.py manage_event_partitions
+
+echo "Event partitions check completed"
+
+python manage.py manage_event_partitions --interval 86400 &
+
 echo "Starting app"
 
 watchmedo auto-restart --directory=./  --pattern=""*.py"" --recursive -- waitress-serve --port=$PORT --threads=8 help_to_heat.wsgi:application
@@ -0,0 +1,118 @@
+import collections
+import datetime
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 256
+
+
+def normalise_text(text):
+    """Upper-case the search text and collapse its whitespace so the same search always has the same key"""
+    return " ".join(str(text).upper().split())
+
+
+class AddressCache:
+    """Address search results kept in an in-process LRU, backed by an optional shared table.
+    Size and TTL are read from settings on each lookup."""
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return settings.ADDRESS_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return settings.ADDRESS_CACHE_TTL
+
+    def get_from_memory(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return results
+
+    def set_in_memory(self, key, results):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_from_database(self, key):
+        if not settings.ADDRESS_CACHE_DATABASE or len(key) > MAX_KEY_LENGTH:
+            return None
+        fresh_from = timezone.now() - datetime.timedelta(seconds=self.ttl)
+        search = models.AddressSearch.objects.filter(text=key, modified_at__gte=fresh_from).first()
+        return search and tuple(search.results)
+
+    def set_in_database(self, key, results):
+        if settings.ADDRESS_CACHE_DATABASE and len(key) <= MAX_KEY_LENGTH:
+            models.AddressSearch.objects.update_or_create(text=key, defaults={"results": list(results)})
+
+    def get(self, text, search):
+        key = normalise_text(text)
+        results = self.get_from_memory(key)
+        if results is not None:
+            self.memory_hits += 1
+            return results
+        results = self.get_from_database(key)
+        if results is not None:
+            self.database_hits += 1
+        else:
+            self.misses += 1
+            results = tuple(search())
+            self.set_in_database(key, results)
+        self.set_in_memory(key, results)
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.memory_hits + self.database_hits + self.misses
+        hits = self.memory_hits + self.database_hits
+        return {
+            "size": len(self.entries),
+            "memory_hits": self.memory_hits,
+            "database_hits": self.database_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0,
+        }
+
+
+address_cache = AddressCache()
+
+
+def cached(func):
+    """Serve `func(text)` from the address cache, only calling it on a miss"""
+
+    @functools.wraps(func)
+    def _inner(text):
+        results = address_cache.get(text, lambda: func(text))
+        logger.debug("Address cache: %s", address_cache.stats())
+        return results
+
+    return _inner
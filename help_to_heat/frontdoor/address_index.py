@@ -0,0 +1,231 @@
+import array
+import bisect
+import csv
+import itertools
+import json
+import mmap
+import os
+import pathlib
+import re
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+
+from django.conf import settings
+
+from help_to_heat import utils
+from help_to_heat.portal import epc_writer
+
+MAGIC = b"ADDRIDX1"
+HEADER = struct.Struct("=8sQQ")
+MAX_RESULTS = 10
+WRITE_CHUNK_SIZE = 100_000
+POSTCODE_PATTERN = re.compile(r"\b([A-Z]{1,2}[0-9][A-Z0-9]?) ?([0-9][A-Z]{2})\b")
+WORD_PATTERN = re.compile(r"[A-Z0-9]+")
+
+
+def normalise_postcode(postcode):
+    return "".join(str(postcode).upper().split())
+
+
+def postcode_key(postcode):
+    """A postcode packed into a uint64 that sorts the same way as the postcode"""
+    return int.from_bytes(normalise_postcode(postcode).encode("ascii")[:8].ljust(8), "big")
+
+
+def get_words(text):
+    return set(WORD_PATTERN.findall(text.upper()))
+
+
+class AddressIndex:
+    """Addresses held in a file grouped by postcode, each postcode's addresses zlib compressed JSON.
+
+    The file has the header, sorted postcode keys, offsets of each postcode's block, sorted uint64
+    UPRNs with the uint32 number of their postcode, then the blocks. It is memory mapped, so every
+    worker process on an instance shares the same pages."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        with self.path.open("rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, postcode_count, uprn_count = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an address index")
+        view = memoryview(self.mmap)
+        offsets_start = HEADER.size + 8 * postcode_count
+        uprns_start = offsets_start + 8 * (postcode_count + 1)
+        uprn_postcodes_start = uprns_start + 8 * uprn_count
+        self.blocks_start = uprn_postcodes_start + 4 * uprn_count
+        self.postcode_count = postcode_count
+        self.uprn_count = uprn_count
+        self.postcodes = view[HEADER.size : offsets_start].cast("Q")
+        self.offsets = view[offsets_start:uprns_start].cast("Q")
+        self.uprns = view[uprns_start:uprn_postcodes_start].cast("Q")
+        self.uprn_postcodes = view[uprn_postcodes_start : self.blocks_start].cast("I")
+
+    def __len__(self):
+        return self.uprn_count
+
+    def get_block(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return json.loads(zlib.decompress(self.mmap[self.blocks_start + start : self.blocks_start + end]))
+
+    def get_postcode(self, postcode):
+        """The [uprn, address] pairs for the postcode, or None if it isn't in the index"""
+        key = postcode_key(postcode)
+        index = bisect.bisect_left(self.postcodes, key)
+        if index == self.postcode_count or self.postcodes[index] != key:
+            return None
+        return self.get_block(index)
+
+    def find(self, text):
+        """Addresses in the postcode found in `text`, best matches for the rest of it first, or None if
+        there's no postcode or it isn't in the index"""
+        text = str(text).upper()
+        matches = list(POSTCODE_PATTERN.finditer(text))
+        if not matches:
+            return None
+        match = matches[-1]
+        addresses = self.get_postcode(match.group(1) + match.group(2))
+        if addresses is None:
+            return None
+        words = get_words(text[: match.start()] + text[match.end() :])
+        addresses.sort(key=lambda uprn_address: -len(words & get_words(uprn_address[1])))
+        return [{"uprn": str(uprn), "address": address} for (uprn, address) in addresses[:MAX_RESULTS]]
+
+    def get(self, uprn):
+        uprn = int(uprn)
+        index = bisect.bisect_left(self.uprns, uprn)
+        if index == self.uprn_count or self.uprns[index] != uprn:
+            return None
+        for block_uprn, address in self.get_block(self.uprn_postcodes[index]):
+            if block_uprn == uprn:
+                return {"uprn": str(uprn), "address": address}
+        return None
+
+
+_indexes = utils.FileCache(AddressIndex)
+
+
+def get_index():
+    """The index at ADDRESS_INDEX_PATH, reopened when the file is replaced, or None if there isn't one"""
+    return _indexes.get(settings.ADDRESS_INDEX_PATH)
+
+
+def read_rows(path):
+    path = pathlib.Path(path)
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if "features" in data:
+        yield from (feature["properties"] for feature in data["features"])
+    else:
+        yield from (result[next(iter(result))] for result in data.get("results", ()))
+
+
+def read_records(path):
+    """(uprn, address, postcode) from an OS Places API or osdatahub JSON response, or an AddressBase CSV
+    with UPRN, ADDRESS and POSTCODE or POSTCODE_LOCATOR columns. CSV rows are read one at a time"""
+    for row in read_rows(path):
+        postcode = row.get("POSTCODE") or row.get("POSTCODE_LOCATOR")
+        if row.get("UPRN") and row.get("ADDRESS") and postcode:
+            yield int(row["UPRN"]), row["ADDRESS"], postcode
+
+
+def write_records(sources, records_path):
+    """Write the records as "postcode key, sequence, uprn, address" lines, which sort by postcode and then
+    by the order they were read in"""
+    with records_path.open("w", encoding="utf-8") as f:
+        f.write("key\tsequence\tuprn\taddress\n")
+        records = (record for source in sources for record in read_records(source))
+        for sequence, (uprn, address, postcode) in enumerate(records):
+            f.write(f"{postcode_key(postcode):016x}\t{sequence:012d}\t{uprn}\t{json.dumps(address)}\n")
+
+
+def read_postcodes(sorted_records_path):
+    """(postcode key, {uprn: address}) for each postcode in the sorted records, keeping the first address
+    read for each UPRN"""
+    with sorted_records_path.open("r", encoding="utf-8") as f:
+        f.readline()
+        lines = (line.rstrip("\n").split("\t", 3) for line in f)
+        for key, postcode_lines in itertools.groupby(lines, key=lambda line: line[0]):
+            addresses = {}
+            for _, _, uprn, address in postcode_lines:
+                addresses.setdefault(int(uprn), json.loads(address))
+            yield int(key, 16), addresses
+
+
+def write_blocks(sorted_records_path, blocks_path, uprns_path):
+    """Write each postcode's block as it is finished, and "uprn, postcode number" lines to sort for the
+    UPRN lookup. Returns the postcode keys and block offsets"""
+    keys, offsets = array.array("Q"), array.array("Q", [0])
+    with blocks_path.open("wb") as blocks, uprns_path.open("w") as uprns:
+        uprns.write("uprn\tpostcode\n")
+        for index, (key, addresses) in enumerate(read_postcodes(sorted_records_path)):
+            block = zlib.compress(json.dumps(list(addresses.items())).encode("utf-8"))
+            blocks.write(block)
+            keys.append(key)
+            offsets.append(offsets[-1] + len(block))
+            uprns.writelines(f"{uprn:020d}\t{index}\n" for uprn in addresses)
+    return keys, offsets
+
+
+def write_uprns(sorted_uprns_path, f, uprn_postcodes):
+    """Write the sorted UPRNs to `f` and their postcode numbers to `uprn_postcodes`, a chunk at a time"""
+    with sorted_uprns_path.open("r") as lines:
+        lines.readline()
+        while True:
+            chunk = [line.split("\t") for line in itertools.islice(lines, WRITE_CHUNK_SIZE)]
+            if not chunk:
+                return
+            array.array("Q", (int(uprn) for (uprn, _) in chunk)).tofile(f)
+            array.array("I", (int(index) for (_, index) in chunk)).tofile(uprn_postcodes)
+
+
+def count_lines(path):
+    with path.open("rb") as f:
+        return sum(1 for _ in f) - 1
+
+
+def build_index(path, sources, buffer_size=epc_writer.SORT_BUFFER_SIZE):
+    """Build the index from the sources without holding them in memory, by sorting the records by postcode
+    and then the UPRNs on disk"""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    started_at = time.monotonic()
+    print(f"Building address index at {path}")  # noqa: T201
+    with tempfile.TemporaryDirectory(dir=path.parent) as temp_dir:
+        temp_dir = pathlib.Path(temp_dir)
+        records_path, sorted_records_path = temp_dir / "records.tsv", temp_dir / "records.sorted.tsv"
+        uprns_path, sorted_uprns_path = temp_dir / "uprns.tsv", temp_dir / "uprns.sorted.tsv"
+        blocks_path, uprn_postcodes_path = temp_dir / "blocks", temp_dir / "uprn_postcodes"
+        index_path = temp_dir / path.name
+
+        write_records(sources, records_path)
+        epc_writer.sort_file(records_path, sorted_records_path, buffer_size)
+        records_path.unlink()
+        keys, offsets = write_blocks(sorted_records_path, blocks_path, uprns_path)
+        sorted_records_path.unlink()
+        epc_writer.sort_file(uprns_path, sorted_uprns_path, buffer_size)
+        uprns_path.unlink()
+        uprn_count = count_lines(sorted_uprns_path)
+
+        with index_path.open("wb") as f:
+            f.write(HEADER.pack(MAGIC, len(keys), uprn_count))
+            keys.tofile(f)
+            offsets.tofile(f)
+            with uprn_postcodes_path.open("wb") as uprn_postcodes:
+                write_uprns(sorted_uprns_path, f, uprn_postcodes)
+            for part_path in (uprn_postcodes_path, blocks_path):
+                with part_path.open("rb") as part:
+                    shutil.copyfileobj(part, f)
+        os.replace(index_path, path)
+    duration = time.monotonic() - started_at
+    print(  # noqa: T201
+        f"Wrote {uprn_count} addresses in {len(keys)} postcodes ({path.stat().st_size} bytes) in {duration:.1f}s"
+    )
+    return uprn_count
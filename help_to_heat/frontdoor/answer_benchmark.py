@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.db import connection, transaction
+
+from help_to_heat import utils
+
+from . import interface, models, schemas
+
+SESSIONS = 200_000
+ANSWERS_PER_SESSION = 10
+SAMPLES = 1000
+
+
+def seed_answers(cursor, sessions, answers_per_session):
+    """Insert `answers_per_session` answers, spread over the pages with resubmissions, for each of `sessions`"""
+    answer_table = models.Answer._meta.db_table
+    cursor.execute(
+        f"""
+        INSERT INTO {answer_table} (id, session_id, page_name, data, created_at, modified_at)
+        SELECT
+            md5('answer' || s || '-' || a)::uuid,
+            md5('session' || s)::uuid,
+            (%s::text[])[1 + (a * 7 + s) %% %s],
+            jsonb_build_object('benchmark', a),
+            now() - make_interval(secs => a),
+            now()
+        FROM generate_series(1, %s) s, generate_series(1, %s) a
+        """,
+        [list(schemas.pages), len(schemas.pages), sessions, answers_per_session],
+    )
+    cursor.execute(f"ANALYZE {answer_table}")
+    cursor.execute("SELECT md5('session' || s)::uuid FROM generate_series(1, %s) s", [sessions])
+    return [session_id for (session_id,) in cursor.fetchall()]
+
+
+def time_calls(func, arguments):
+    durations = []
+    for args in arguments:
+        started_at = time.perf_counter()
+        func(*args)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return {"p50_ms": utils.percentile(durations, 0.5), "p99_ms": utils.percentile(durations, 0.99)}
+
+
+def measure(session_ids, samples):
+    sample_ids = random.choices(session_ids, k=samples)
+    answer_lookups = tuple((session_id, random.choice(schemas.pages)) for session_id in sample_ids)
+    return {
+        "get_answer": time_calls(interface.get_latest_answer_data, answer_lookups),
+        "get_session": time_calls(interface.fold_answers, tuple((session_id,) for session_id in sample_ids)),
+    }
+
+
+def run(sessions=SESSIONS, answers_per_session=ANSWERS_PER_SESSION, samples=SAMPLES):
+    """Time the queries behind get_answer and get_session without and then with the Answer indexes.
+
+    Everything happens inside a transaction that is rolled back, but the table is locked while
+    the indexes are dropped, so don't run this against a live database."""
+    indexes = models.Answer._meta.indexes
+    results = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            session_ids = seed_answers(cursor, sessions, answers_per_session)
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in indexes:
+                schema_editor.remove_index(models.Answer, index)
+        results["without indexes"] = measure(session_ids, samples)
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in indexes:
+                schema_editor.add_index(models.Answer, index)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {models.Answer._meta.db_table}")
+        results["with indexes"] = measure(session_ids, samples)
+        transaction.set_rollback(True)
+    return results
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FrontdoorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "help_to_heat.frontdoor"
+
+    def ready(self):
+        from help_to_heat.portal import epc_bloom, epc_snapshot
+
+        epc_bloom.get_bloom_filter()
+        epc_snapshot.get_snapshot()
@@ -0,0 +1,146 @@
+import collections
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import os_places
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while once too many recent calls have failed or been slow,
+    then lets a single probe call through to see whether it has recovered.
+    Calls count as failed if they take `slow_call` seconds or more, or raise an exception `is_failure` accepts.
+    The circuit opens once at least `min_calls` calls in the last `window` seconds have a failure rate of
+    `failure_rate` or more, and lets a probe through after `reset_timeout` seconds."""
+
+    def __init__(
+        self,
+        name,
+        is_failure=lambda e: True,
+        window=60,
+        min_calls=5,
+        failure_rate=0.5,
+        slow_call=5.0,
+        reset_timeout=30,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.opened_at = None
+        self.probing = False
+        self.outcomes = collections.deque()
+        self.lock = threading.Lock()
+        self.transitions = collections.Counter()
+        self.rejected = 0
+        self.probes = 0
+
+    def transition(self, state):
+        logger.warning("%s circuit breaker %s -> %s", self.name, self.state, state)
+        self.transitions[(self.state, state)] += 1
+        self.state = state
+        self.opened_at = time.monotonic() if state == OPEN else None
+
+    def forget_old_outcomes(self, now):
+        while self.outcomes and self.outcomes[0][0] < now - self.window:
+            self.outcomes.popleft()
+
+    def before_call(self):
+        """Whether the call is a half-open probe, raising CircuitOpen if it shouldn't be made at all"""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                self.probes += 1
+                logger.info("%s circuit breaker letting a probe through", self.name)
+                return True
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} is unavailable")
+
+    def after_call(self, is_probe, failed, duration):
+        failed = failed or duration >= self.slow_call
+        now = time.monotonic()
+        with self.lock:
+            if is_probe:
+                self.probing = False
+                self.outcomes.clear()
+                self.transition(OPEN if failed else CLOSED)
+                return
+            if self.state != CLOSED:
+                return
+            self.outcomes.append((now, failed, duration))
+            self.forget_old_outcomes(now)
+            failures = sum(1 for (_, is_failure, _) in self.outcomes if is_failure)
+            calls = len(self.outcomes)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self.outcomes.clear()
+                self.transition(OPEN)
+
+    def call(self, func, *args, **kwargs):
+        is_probe = self.before_call()
+        started_at = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:  # noqa: B902
+            self.after_call(is_probe, self.is_failure(e), time.monotonic() - started_at)
+            raise
+        self.after_call(is_probe, False, time.monotonic() - started_at)
+        return result
+
+    def protect(self, func):
+        @functools.wraps(func)
+        def _inner(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+
+        return _inner
+
+    def reset(self):
+        with self.lock:
+            self.state = CLOSED
+            self.opened_at = None
+            self.probing = False
+            self.outcomes.clear()
+
+    def stats(self):
+        with self.lock:
+            durations = [duration for (_, _, duration) in self.outcomes]
+            return {
+                "state": self.state,
+                "recent_calls": len(self.outcomes),
+                "recent_failures": sum(1 for (_, is_failure, _) in self.outcomes if is_failure),
+                "mean_latency": sum(durations) / len(durations) if durations else 0,
+                "rejected": self.rejected,
+                "probes": self.probes,
+                "transitions": {f"{before} -> {after}": count for (before, after), count in self.transitions.items()},
+            }
+
+
+address_breaker = CircuitBreaker(
+    "OS Places",
+    is_failure=os_places.is_unavailable,
+    window=settings.ADDRESS_BREAKER_WINDOW,
+    min_calls=settings.ADDRESS_BREAKER_MIN_CALLS,
+    failure_rate=settings.ADDRESS_BREAKER_FAILURE_RATE,
+    slow_call=settings.ADDRESS_BREAKER_SLOW_CALL,
+    reset_timeout=settings.ADDRESS_BREAKER_RESET_TIMEOUT,
+)
@@ -0,0 +1,123 @@
+import datetime
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime.date(year, month_index + 1, 1)
+
+
+def get_event_table():
+    return models.Event._meta.db_table
+
+
+def get_partition_name(month):
+    return f"{get_event_table()}_p{month:%Y_%m}"
+
+
+def get_partitions(cursor):
+    """The monthly partitions of the event table, as a dict of the month they start to their name"""
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [get_event_table()],
+    )
+    pattern = re.compile(rf"{get_event_table()}_p(\d{{4}})_(\d{{2}})")
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = pattern.fullmatch(name)
+        if match:
+            partitions[datetime.date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(cursor, month):
+    """Create the partition for `month`, moving any of its rows out of the default partition first"""
+    event_table = get_event_table()
+    name = get_partition_name(month)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic():
+        cursor.execute(f"CREATE TABLE {name} (LIKE {event_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {event_table}_default WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            bounds,
+        )
+        cursor.execute(f"ALTER TABLE {event_table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    return name
+
+
+def create_partitions(months_ahead=MONTHS_AHEAD):
+    """Make sure there's a partition for this month and each of the next `months_ahead`"""
+    this_month = datetime.date.today().replace(day=1)
+    created = []
+    with connection.cursor() as cursor:
+        partitions = get_partitions(cursor)
+        for months in range(months_ahead + 1):
+            month = add_months(this_month, months)
+            if month not in partitions:
+                created.append(create_partition(cursor, month))
+    return created
+
+
+def drop_partitions(retention_months=None):
+    """Drop whole partitions whose events are all older than `retention_months`, along with any
+    events that old in the default partition"""
+    retention_months = settings.EVENT_RETENTION_MONTHS if retention_months is None else retention_months
+    event_table = get_event_table()
+    cutoff = add_months(datetime.date.today().replace(day=1), -retention_months)
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(get_partitions(cursor).items()):
+            if add_months(month, 1) > cutoff:
+                continue
+            with transaction.atomic():
+                cursor.execute(f"SELECT count(*), pg_total_relation_size(%s::regclass) FROM {name}", [name])
+                rows, size = cursor.fetchone()
+                cursor.execute(f"ALTER TABLE {event_table} DETACH PARTITION {name}")
+                cursor.execute(f"DROP TABLE {name}")
+            dropped.append((name, rows, size))
+        cursor.execute(f"DELETE FROM {event_table}_default WHERE created_at < %s", [cutoff])
+    return cutoff, dropped
+
+
+def manage_partitions(months_ahead=MONTHS_AHEAD, retention_months=None):
+    for name in create_partitions(months_ahead):
+        print(f"Created {name}")  # noqa: T201
+    cutoff, dropped = drop_partitions(retention_months)
+    for name, rows, size in dropped:
+        print(f"Dropped {name}: {rows} events, {size / 1024 / 1024:.1f}MB")  # noqa: T201
+    print(f"Keeping events from {cutoff} onwards")  # noqa: T201
+
+
+def run_partition_manager(interval=None, **kwargs):
+    """Manage partitions once, or every `interval` seconds if one is given, carrying on after a failed run
+    such as one that raced another instance to create the same partition"""
+    while True:
+        if not interval:
+            return manage_partitions(**kwargs)
+        try:
+            manage_partitions(**kwargs)
+        except Exception:  # noqa: B902
+            logger.exception("Managing event partitions failed")
+            connection.close()
+        time.sleep(interval)
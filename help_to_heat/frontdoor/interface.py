@@ -1,17 +1,30 @@
+import json
+
 import marshmallow
-import osdatahub
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
 
 from help_to_heat import portal
+from help_to_heat.portal import epc_bloom, epc_snapshot
 from help_to_heat.utils import Entity, Interface, register_event, with_schema
 
-from . import models, schemas
+from . import (
+    address_cache,
+    address_index,
+    circuit_breaker,
+    models,
+    os_places,
+    schemas,
+    session_cache,
+)
 
 
 class SaveAnswerSchema(marshmallow.Schema):
     session_id = marshmallow.fields.UUID()
     page_name = marshmallow.fields.String(validate=marshmallow.validate.OneOf(schemas.pages))
-    data = marshmallow.fields.Nested(schemas.SessionSchema(unknown=marshmallow.EXCLUDE))
+    data = marshmallow.fields.Nested(schemas.CompiledSessionSchema(unknown=marshmallow.EXCLUDE))
 
 
 class RemoveAnswerSchema(marshmallow.Schema):
@@ -28,6 +41,16 @@ class GetSessionSchema(marshmallow.Schema):
     session_id = marshmallow.fields.UUID()
 
 
+class GetSessionsSchema(marshmallow.Schema):
+    session_ids = marshmallow.fields.List(marshmallow.fields.UUID())
+
+
+class SessionsSchema(marshmallow.Schema):
+    sessions = marshmallow.fields.Dict(
+        keys=marshmallow.fields.String(), values=marshmallow.fields.Nested(schemas.CompiledSessionSchema)
+    )
+
+
 class CreateReferralSchema(marshmallow.Schema):
     session_id = marshmallow.fields.UUID()
 
@@ -35,7 +58,7 @@ class CreateReferralSchema(marshmallow.Schema):
 class ReferralSchema(marshmallow.Schema):
     id = marshmallow.fields.UUID()
     session_id = marshmallow.fields.UUID()
-    data = marshmallow.fields.Nested(schemas.SessionSchema(unknown=marshmallow.EXCLUDE))
+    data = marshmallow.fields.Nested(schemas.CompiledSessionSchema(unknown=marshmallow.EXCLUDE))
 
 
 class FindAddressesSchema(marshmallow.Schema):
@@ -51,6 +74,16 @@ class AddressSchema(marshmallow.Schema):
     address = marshmallow.fields.String()
 
 
+class SearchAddressesSchema(marshmallow.Schema):
+    session_id = marshmallow.fields.UUID()
+    text = marshmallow.fields.String()
+
+
+class SelectAddressSchema(marshmallow.Schema):
+    session_id = marshmallow.fields.UUID()
+    uprn = marshmallow.fields.Integer()
+
+
 class GetEPCSchema(marshmallow.Schema):
     uprn = marshmallow.fields.Integer()
 
@@ -71,31 +104,123 @@ class SuccessSchema(marshmallow.Schema):
     success = marshmallow.fields.Boolean()
 
 
+def get_latest_answer_data(session_id, page_name):
+    answers = models.Answer.objects.filter(session_id=session_id, page_name=page_name).order_by("-created_at")
+    return answers.values_list("data", flat=True).first()
+
+
+def fold_answers(session_id):
+    if settings.ANSWER_FOLD_MODE == "DATABASE":
+        return fold_answers_in_database([session_id]).get(str(session_id), {})
+    answers = models.Answer.objects.filter(session_id=session_id).order_by("created_at")
+    return {k: v for data in answers.values_list("data", flat=True) for (k, v) in data.items()}
+
+
+def fold_answers_in_database(session_ids):
+    """Merge each session's answers inside Postgres, later answers winning, as a dict of session_id to session"""
+    answer_table = models.Answer._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT answer.session_id, jsonb_object_agg(field.key, field.value ORDER BY answer.created_at)
+            FROM {answer_table} answer CROSS JOIN LATERAL jsonb_each(answer.data) field
+            WHERE answer.session_id = ANY(%s::uuid[])
+            GROUP BY answer.session_id
+            """,
+            [[str(session_id) for session_id in session_ids]],
+        )
+        return {str(session_id): json.loads(data) for (session_id, data) in cursor.fetchall()}
+
+
+def upsert_answer(session_id, page_name, data):
+    """Replace the page's latest answer rather than adding another, keeping the old one in
+    AnswerHistory if ANSWER_HISTORY is set. Must be called inside a transaction."""
+    answers = models.Answer.objects.select_for_update().filter(session_id=session_id, page_name=page_name)
+    answer = answers.order_by("-created_at").first()
+    if not answer:
+        return models.Answer.objects.create(session_id=session_id, page_name=page_name, data=data).data
+    if settings.ANSWER_HISTORY:
+        models.AnswerHistory.objects.create(
+            session_id=session_id, page_name=page_name, data=answer.data, answered_at=answer.created_at
+        )
+    now = timezone.now()
+    models.Answer.objects.filter(pk=answer.pk).update(data=data, created_at=now, modified_at=now)
+    return data
+
+
+def merge_session_state(session_id, data):
+    """Merge an answer's data into the session's state. A session without a state yet, such as one started
+    before states were kept, gets one seeded from all its answers so far."""
+    session_state_table = models.SessionState._meta.db_table
+    answer_table = models.Answer._meta.db_table
+    data = json.dumps(data, cls=DjangoJSONEncoder)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {session_state_table} SET data = data || %s::jsonb, modified_at = now()
+            WHERE session_id = %s
+            """,
+            [data, str(session_id)],
+        )
+        if cursor.rowcount:
+            return
+        cursor.execute(
+            f"""
+            INSERT INTO {session_state_table} (session_id, data, created_at, modified_at)
+            SELECT %s, coalesce(
+                (
+                    SELECT jsonb_object_agg(field.key, field.value ORDER BY answer.created_at)
+                    FROM {answer_table} answer CROSS JOIN LATERAL jsonb_each(answer.data) field
+                    WHERE answer.session_id = %s
+                ),
+                '{{}}'::jsonb
+            ) || %s::jsonb, now(), now()
+            ON CONFLICT (session_id) DO UPDATE
+            SET data = {session_state_table}.data || EXCLUDED.data, modified_at = EXCLUDED.modified_at
+            """,
+            [str(session_id), str(session_id), data],
+        )
+
+
 class Session(Entity):
-    @with_schema(load=SaveAnswerSchema, dump=schemas.SessionSchema)
+    @session_cache.invalidates
+    @with_schema(load=SaveAnswerSchema, dump=schemas.CompiledSessionSchema)
     @register_event(models.Event, "Answer saved")
     def save_answer(self, session_id, page_name, data):
-        answer = models.Answer.objects.create(
-            session_id=session_id,
-            page_name=page_name,
-            data=data,
-        )
-        return answer.data
+        with transaction.atomic():
+            if settings.ANSWER_STORAGE_MODE == "UPSERT":
+                data = upsert_answer(session_id, page_name, data)
+            else:
+                data = models.Answer.objects.create(session_id=session_id, page_name=page_name, data=data).data
+            merge_session_state(session_id, data)
+        return data
 
-    @with_schema(load=GetAnswerSchema, dump=schemas.SessionSchema)
+    @session_cache.memoise
+    @with_schema(load=GetAnswerSchema, dump=schemas.CompiledSessionSchema)
     def get_answer(self, session_id, page_name):
-        try:
-            answer = models.Answer.objects.filter(session_id=session_id, page_name=page_name).latest("created_at")
-            return answer.data
-        except models.Answer.DoesNotExist:
-            return {}
+        return get_latest_answer_data(session_id, page_name) or {}
 
-    @with_schema(load=GetSessionSchema, dump=schemas.SessionSchema)
+    @session_cache.memoise
+    @with_schema(load=GetSessionSchema, dump=schemas.CompiledSessionSchema)
     def get_session(self, session_id):
-        answers = models.Answer.objects.filter(session_id=session_id).order_by("created_at").all()
-        session = {k: v for a in answers for (k, v) in a.data.items()}
+        state = models.SessionState.objects.filter(session_id=session_id).first()
+        if state:
+            return state.data
+        session = fold_answers(session_id)
+        if session:
+            models.SessionState.objects.get_or_create(session_id=session_id, defaults={"data": session})
         return session
 
+    @with_schema(load=GetSessionsSchema, dump=SessionsSchema)
+    def get_sessions(self, session_ids):
+        """Sessions for many session_ids at once, for reports and exports. Doesn't backfill SessionState."""
+        states = models.SessionState.objects.filter(session_id__in=session_ids).values_list("session_id", "data")
+        sessions = {str(session_id): data for (session_id, data) in states}
+        missing = [session_id for session_id in session_ids if str(session_id) not in sessions]
+        if missing:
+            sessions.update(fold_answers_in_database(missing))
+        return {"sessions": sessions}
+
     @with_schema(load=CreateReferralSchema, dump=ReferralSchema)
     @register_event(models.Event, "Referral created")
     def create_referral(self, session_id):
@@ -106,28 +231,70 @@ class Session(Entity):
         return referral_data
 
 
+@address_cache.cached
+@circuit_breaker.address_breaker.protect
+def find_os_addresses(text):
+    api = os_places.get_client()
+    api_results = api.find(text, dataset="LPI", limit=10)["features"]
+    if len(api_results) > 10:
+        api_results = api_results[:10]
+    results = tuple({"uprn": r["properties"]["UPRN"], "address": r["properties"]["ADDRESS"]} for r in api_results)
+    return results
+
+
+@circuit_breaker.address_breaker.protect
+def get_os_address(uprn):
+    api = os_places.get_client()
+    api_results = api.uprn(int(uprn), dataset="LPI")["features"]
+    address = api_results[0]["properties"]["ADDRESS"]
+    result = {"uprn": uprn, "address": address}
+    return result
+
+
 class Address(Entity):
     @with_schema(load=FindAddressesSchema, dump=AddressSchema(many=True))
     def find_addresses(self, text):
-        api = osdatahub.PlacesAPI(settings.OS_API_KEY)
-        api_results = api.find(text, dataset="LPI")["features"]
-        if len(api_results) > 10:
-            api_results = api_results[:10]
-        results = tuple({"uprn": r["properties"]["UPRN"], "address": r["properties"]["ADDRESS"]} for r in api_results)
-        return results
+        index = address_index.get_index()
+        results = index.find(text) if index is not None else None
+        if results is not None:
+            return results
+        return find_os_addresses(text)
 
     @with_schema(load=GetAddressSchema, dump=AddressSchema)
     def get_address(self, uprn):
-        api = osdatahub.PlacesAPI(settings.OS_API_KEY)
-        api_results = api.uprn(int(uprn), dataset="LPI")["features"]
-        address = api_results[0]["properties"]["ADDRESS"]
-        result = {"uprn": uprn, "address": address}
-        return result
+        index = address_index.get_index()
+        result = index.get(uprn) if index is not None else None
+        if result is not None:
+            return result
+        return get_os_address(uprn)
+
+    @with_schema(load=SearchAddressesSchema, dump=AddressSchema(many=True))
+    def search_addresses(self, session_id, text):
+        """find_addresses, remembering the results for select_address"""
+        results = self.find_addresses(text)
+        models.AddressSearchResults.objects.update_or_create(session_id=session_id, defaults={"results": results})
+        return results
+
+    @with_schema(load=SelectAddressSchema, dump=AddressSchema)
+    def select_address(self, session_id, uprn):
+        """The address the session was offered for `uprn`, only asking OS Places if it wasn't one of them"""
+        search = models.AddressSearchResults.objects.filter(session_id=session_id).first()
+        results = search.results if search else ()
+        for result in results:
+            if result["uprn"] == str(uprn):
+                return result
+        return self.get_address(uprn)
 
 
 class EPC(Entity):
     @with_schema(load=GetEPCSchema, dump=EPCSchema)
     def get_epc(self, uprn):
+        bloom_filter = epc_bloom.get_bloom_filter()
+        if bloom_filter is not None and uprn not in bloom_filter:
+            return {}
+        snapshot = epc_snapshot.get_snapshot()
+        if snapshot is not None:
+            return snapshot.get(uprn) or {}
         try:
             epc = portal.models.EpcRating.objects.get(uprn=uprn)
         except portal.models.EpcRating.DoesNotExist:
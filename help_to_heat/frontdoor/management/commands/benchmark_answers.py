@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from help_to_heat.frontdoor import answer_benchmark
+
+
+class Command(BaseCommand):
+    help = "Seed answers and time get_answer and get_session lookups with and without the Answer indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=answer_benchmark.SESSIONS, help="How many sessions to seed")
+        parser.add_argument(
+            "--answers-per-session", type=int, default=answer_benchmark.ANSWERS_PER_SESSION, help="Answers per session"
+        )
+        parser.add_argument("--samples", type=int, default=answer_benchmark.SAMPLES, help="How many lookups to time")
+
+    def handle(self, *args, **kwargs):
+        total = kwargs["sessions"] * kwargs["answers_per_session"]
+        print(f"Seeding {total} answers, this is rolled back afterwards")  # noqa: T201
+        results = answer_benchmark.run(kwargs["sessions"], kwargs["answers_per_session"], kwargs["samples"])
+        for label, timings in results.items():
+            for call, timing in timings.items():
+                print(f"{label}: {call} p50 {timing['p50_ms']:.3f}ms, p99 {timing['p99_ms']:.3f}ms")  # noqa: T201
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from help_to_heat.frontdoor import address_index
+
+
+class Command(BaseCommand):
+    help = "Build the memory mapped address index from AddressBase CSV or OS Places JSON extracts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="+", type=str, help="CSV or JSON extracts to index")
+        parser.add_argument("-p", "--path", type=str, default=settings.ADDRESS_INDEX_PATH, help="Where to write it")
+
+    def handle(self, *args, **kwargs):
+        address_index.build_index(kwargs["path"], kwargs["sources"])
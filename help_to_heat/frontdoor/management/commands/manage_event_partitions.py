@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from help_to_heat.frontdoor import event_partitions
+
+
+class Command(BaseCommand):
+    help = "Create the coming months' event partitions and drop those older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=event_partitions.MONTHS_AHEAD,
+            help="How many months of partitions to create in advance",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            default=settings.EVENT_RETENTION_MONTHS,
+            help="Drop partitions of events older than this many months",
+        )
+        parser.add_argument("--interval", type=int, help="Keep running, checking every this many seconds")
+
+    def handle(self, *args, **kwargs):
+        event_partitions.run_partition_manager(
+            interval=kwargs["interval"],
+            months_ahead=kwargs["months_ahead"],
+            retention_months=kwargs["retention_months"],
+        )
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from help_to_heat.frontdoor import session_purge
+
+
+class Command(BaseCommand):
+    help = "Delete the answers and events of sessions that were abandoned before making a referral"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-days", type=int, default=settings.SESSION_TTL_DAYS, help="How many idle days before purging"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=session_purge.CHUNK_SIZE, help="Answers to delete per transaction"
+        )
+        parser.add_argument("--archive", type=str, help="Append purged answers to this gzipped JSON lines file")
+        parser.add_argument("--vacuum", action="store_true", help="Vacuum the tables afterwards")
+        parser.add_argument("--interval", type=int, help="Keep running, purging every this many seconds")
+
+    def handle(self, *args, **kwargs):
+        session_purge.run_purger(
+            interval=kwargs["interval"],
+            ttl_days=kwargs["ttl_days"],
+            chunk_size=kwargs["chunk_size"],
+            archive_path=kwargs["archive"],
+            vacuum=kwargs["vacuum"],
+        )
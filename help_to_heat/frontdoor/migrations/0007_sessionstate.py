@@ -0,0 +1,31 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:29
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0006_remove_answer_unique answer per page per session"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionState",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("session_id", models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                (
+                    "data",
+                    models.JSONField(
+                        default=dict, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created_at"],
+                "abstract": False,
+            },
+        ),
+    ]
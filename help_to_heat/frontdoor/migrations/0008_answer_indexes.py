@@ -0,0 +1,20 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0007_sessionstate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["session_id", "page_name", "-created_at"], name="answer_session_page_latest"),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["session_id", "created_at"], name="answer_session_created"),
+        ),
+    ]
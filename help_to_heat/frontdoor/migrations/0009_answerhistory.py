@@ -0,0 +1,23 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:34
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0008_answer_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnswerHistory",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("session_id", models.UUIDField(editable=False)),
+                ("page_name", models.CharField(editable=False, max_length=128)),
+                ("data", models.JSONField(editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ("answered_at", models.DateTimeField(editable=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:36
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0009_answerhistory"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answerhistory",
+            name="session_id",
+            field=models.UUIDField(db_index=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                django.db.models.fields.json.KeyTextTransform("session_id", "data"), name="event_session_id"
+            ),
+        ),
+    ]
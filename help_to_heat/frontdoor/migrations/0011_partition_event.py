@@ -0,0 +1,91 @@
+import datetime
+
+from django.db import migrations
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime.date(year, month_index + 1, 1)
+
+
+def partition_event_table(apps, schema_editor):
+    execute = schema_editor.execute
+    execute("ALTER TABLE frontdoor_event RENAME TO frontdoor_event_unpartitioned")
+    execute("ALTER TABLE frontdoor_event_unpartitioned DROP CONSTRAINT frontdoor_event_pkey")
+    execute("DROP INDEX event_session_id")
+    execute(
+        """
+        CREATE TABLE frontdoor_event (
+            id bigint NOT NULL DEFAULT nextval('frontdoor_event_id_seq'),
+            created_at timestamp with time zone NOT NULL,
+            modified_at timestamp with time zone NOT NULL,
+            name varchar(256) NOT NULL,
+            data jsonb NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    execute("ALTER SEQUENCE frontdoor_event_id_seq OWNED BY frontdoor_event.id")
+    execute("CREATE TABLE frontdoor_event_default PARTITION OF frontdoor_event DEFAULT")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(created_at)::date FROM frontdoor_event_unpartitioned")
+        (first_date,) = cursor.fetchone()
+    this_month = datetime.date.today().replace(day=1)
+    month = (first_date or this_month).replace(day=1)
+    while month <= add_months(this_month, MONTHS_AHEAD):
+        execute(
+            f"""
+            CREATE TABLE frontdoor_event_p{month:%Y_%m} PARTITION OF frontdoor_event
+            FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')
+            """
+        )
+        month = add_months(month, 1)
+
+    execute(
+        """
+        INSERT INTO frontdoor_event (id, created_at, modified_at, name, data)
+        SELECT id, created_at, modified_at, name, data FROM frontdoor_event_unpartitioned
+        """
+    )
+    execute("DROP TABLE frontdoor_event_unpartitioned")
+    execute("CREATE INDEX event_session_id ON frontdoor_event ((data ->> 'session_id'))")
+
+
+def unpartition_event_table(apps, schema_editor):
+    execute = schema_editor.execute
+    execute("ALTER TABLE frontdoor_event RENAME TO frontdoor_event_partitioned")
+    execute("ALTER INDEX event_session_id RENAME TO event_session_id_partitioned")
+    execute("ALTER TABLE frontdoor_event_partitioned DROP CONSTRAINT frontdoor_event_pkey")
+    execute(
+        """
+        CREATE TABLE frontdoor_event (
+            id bigint NOT NULL DEFAULT nextval('frontdoor_event_id_seq') PRIMARY KEY,
+            created_at timestamp with time zone NOT NULL,
+            modified_at timestamp with time zone NOT NULL,
+            name varchar(256) NOT NULL,
+            data jsonb NOT NULL
+        )
+        """
+    )
+    execute("ALTER SEQUENCE frontdoor_event_id_seq OWNED BY frontdoor_event.id")
+    execute(
+        """
+        INSERT INTO frontdoor_event (id, created_at, modified_at, name, data)
+        SELECT id, created_at, modified_at, name, data FROM frontdoor_event_partitioned
+        """
+    )
+    execute("DROP TABLE frontdoor_event_partitioned")
+    execute("CREATE INDEX event_session_id ON frontdoor_event ((data ->> 'session_id'))")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0010_session_purge_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_event_table, unpartition_event_table),
+    ]
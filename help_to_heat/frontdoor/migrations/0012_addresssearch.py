@@ -0,0 +1,26 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:48
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0011_partition_event"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AddressSearch",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("text", models.CharField(editable=False, max_length=256, primary_key=True, serialize=False)),
+                ("results", models.JSONField(editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                "ordering": ["created_at"],
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.19 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0013_addresssearchresults"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="addresssearch",
+            index=models.Index(fields=["modified_at"], name="address_search_modified"),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.19 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("frontdoor", "0014_address_search_modified_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["created_at", "id"], name="answer_created"),
+        ),
+    ]
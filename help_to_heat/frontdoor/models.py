@@ -1,5 +1,6 @@
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.fields.json import KeyTextTransform
 
 from help_to_heat import utils
 
@@ -8,14 +9,57 @@ class Event(utils.TimeStampedModel):
     name = models.CharField(max_length=256)
     data = models.JSONField(encoder=DjangoJSONEncoder)
 
+    class Meta(utils.TimeStampedModel.Meta):
+        indexes = [models.Index(KeyTextTransform("session_id", "data"), name="event_session_id")]
+
 
 class Answer(utils.UUIDPrimaryKeyBase, utils.TimeStampedModel):
     data = models.JSONField(encoder=DjangoJSONEncoder, editable=False)
     page_name = models.CharField(max_length=128, editable=False)
     session_id = models.UUIDField(editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["session_id", "page_name", "-created_at"], name="answer_session_page_latest"),
+            models.Index(fields=["session_id", "created_at"], name="answer_session_created"),
+            models.Index(fields=["created_at", "id"], name="answer_created"),
+        ]
+
+
+class AnswerHistory(models.Model):
+    """An answer that was replaced when answers are stored one per page"""
+
+    session_id = models.UUIDField(editable=False, db_index=True)
+    page_name = models.CharField(max_length=128, editable=False)
+    data = models.JSONField(encoder=DjangoJSONEncoder, editable=False)
+    answered_at = models.DateTimeField(editable=False)
+
+
+class SessionState(utils.TimeStampedModel):
+    """Every answer in a session merged together, kept up to date by each saved Answer"""
+
+    session_id = models.UUIDField(primary_key=True, editable=False)
+    data = models.JSONField(encoder=DjangoJSONEncoder, editable=False, default=dict)
+
 
 class Feedback(utils.UUIDPrimaryKeyBase, utils.TimeStampedModel):
     session_id = models.UUIDField(editable=False, blank=True, null=True)
     page_name = models.CharField(max_length=128, editable=False, blank=True, null=True)
     data = models.JSONField(encoder=DjangoJSONEncoder, editable=False)
+
+
+class AddressSearch(utils.TimeStampedModel):
+    """OS Places search results shared between processes, keyed on the normalised search text"""
+
+    text = models.CharField(max_length=256, primary_key=True, editable=False)
+    results = models.JSONField(encoder=DjangoJSONEncoder, editable=False)
+
+    class Meta(utils.TimeStampedModel.Meta):
+        indexes = [models.Index(fields=["modified_at"], name="address_search_modified")]
+
+
+class AddressSearchResults(utils.TimeStampedModel):
+    """The addresses last offered to a session, so the one picked can be found without asking OS Places again"""
+
+    session_id = models.UUIDField(primary_key=True, editable=False)
+    results = models.JSONField(encoder=DjangoJSONEncoder, editable=False, default=list)
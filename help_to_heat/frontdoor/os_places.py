@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "https://api.os.uk/search/places/v1/"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+LOG_STATS_EVERY = 100
+
+
+class PlacesError(Exception):
+    pass
+
+
+def is_unavailable(exception):
+    """Whether the exception means OS Places is down or overloaded, rather than that the request was bad"""
+    if isinstance(exception, requests.HTTPError):
+        return exception.response is not None and exception.response.status_code in RETRY_STATUSES
+    return isinstance(exception, (requests.ConnectionError, requests.Timeout, PlacesError))
+
+
+class PlacesClient:
+    """A thread-safe OS Places client sharing one pool of keep-alive connections, with timeouts,
+    a cap on concurrent requests and retries with jittered exponential backoff.
+    Returns results shaped like osdatahub.PlacesAPI's, a dict with a list of features."""
+
+    def __init__(
+        self,
+        key,
+        pool_size=None,
+        connect_timeout=None,
+        read_timeout=None,
+        max_concurrency=None,
+        retries=None,
+        backoff=None,
+    ):
+        self.key = key
+        self.timeout = (
+            settings.OS_API_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            settings.OS_API_READ_TIMEOUT if read_timeout is None else read_timeout,
+        )
+        self.retries = settings.OS_API_RETRIES if retries is None else retries
+        self.backoff = settings.OS_API_BACKOFF if backoff is None else backoff
+        max_concurrency = settings.OS_API_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or settings.OS_API_POOL_SIZE)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retried = 0
+        self.failures = 0
+
+    def count(self, **increments):
+        with self.lock:
+            for name, increment in increments.items():
+                setattr(self, name, getattr(self, name) + increment)
+            requests = self.requests
+        if increments.get("requests") and requests % LOG_STATS_EVERY == 0:
+            logger.info("OS Places client: %s", self.stats())
+
+    def get_backoff(self, attempt):
+        return random.uniform(0, self.backoff * 2**attempt)
+
+    def send(self, name, params):
+        self.count(requests=1)
+        if not self.slots.acquire(timeout=sum(self.timeout)):
+            self.count(failures=1)
+            raise PlacesError(f"Timed out waiting for an OS Places connection for {name}")
+        try:
+            for attempt in range(self.retries + 1):
+                self.count(attempts=1)
+                try:
+                    response = self.session.get(ENDPOINT + name, params=params, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        self.count(failures=1)
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        if not response.ok:
+                            self.count(failures=1)
+                        response.raise_for_status()
+                        return response.json()
+                self.count(retried=1)
+                time.sleep(self.get_backoff(attempt))
+        finally:
+            self.slots.release()
+
+    def request(self, name, dataset=None, **params):
+        params = {"key": self.key, "output_srs": "EPSG:27700", **params}
+        if dataset:
+            params["dataset"] = dataset
+        data = self.send(name, params)
+        features = [{"properties": result[next(iter(result))]} for result in data.get("results", ())]
+        return {"type": "FeatureCollection", "features": features}
+
+    def find(self, text, dataset=None, limit=100):
+        return self.request("find", dataset=dataset, query=text, maxresults=limit)
+
+    def uprn(self, uprn, dataset=None):
+        return self.request("uprn", dataset=dataset, uprn=uprn)
+
+    def stats(self):
+        """Request counts, the HTTP attempts made for them including retries, and how many attempts went over
+        a new connection rather than reusing one"""
+        pools = self.adapter.poolmanager.pools
+        new_connections = sum(pools[key].num_connections for key in pools.keys())
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "new_connections": new_connections,
+            "reused_connections": max(self.attempts - new_connections, 0),
+            "retried": self.retried,
+            "failures": self.failures,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process's shared PlacesClient"""
+    global _client
+    with _client_lock:
+        if _client is None or _client.key != settings.OS_API_KEY:
+            _client = PlacesClient(settings.OS_API_KEY)
+        return _client
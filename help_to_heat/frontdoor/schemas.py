@@ -1,6 +1,15 @@
+import collections.abc
 import itertools
 
-from marshmallow import Schema, ValidationError, fields, validate
+from marshmallow import (
+    INCLUDE,
+    RAISE,
+    Schema,
+    ValidationError,
+    fields,
+    missing,
+    validate,
+)
 
 page_order = (
     "country",
@@ -296,6 +305,102 @@ class SessionSchema(Schema):
         ordered = True
 
 
+class CannotCompile(Exception):
+    pass
+
+
+class UseSlowPath(Exception):
+    pass
+
+
+def compile_field(field):
+    """How to check a field's value without the generic field machinery: `str` for a plain string,
+    a frozenset of choices for a string that must be one of them, or None to use the field itself"""
+    if field.data_key is not None or field.attribute is not None:
+        raise CannotCompile(field)
+    if field.required or field.load_default is not missing or field.dump_default is not missing:
+        raise CannotCompile(field)
+    if type(field) is not fields.String:
+        return None
+    if not field.validators:
+        return str
+    if len(field.validators) == 1 and type(field.validators[0]) is validate.OneOf:
+        return frozenset(field.validators[0].choices)
+    return None
+
+
+def compile_fields(schema_fields):
+    return tuple((name, compile_field(field), field) for name, field in schema_fields.items())
+
+
+class CompiledSessionSchema(SessionSchema):
+    """SessionSchema with a quicker path for the usual case, where every value is valid.
+
+    Plain strings are taken as they are and choices are checked against frozensets. Anything the quick
+    path doesn't handle, including every invalid value, goes through SessionSchema, so results and
+    errors are the same."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            if any(self._hooks.values()):
+                raise CannotCompile(self._hooks)
+            self.compiled_load_fields = compile_fields(self.load_fields)
+            self.compiled_dump_fields = compile_fields(self.dump_fields)
+        except CannotCompile:
+            self.compiled_load_fields = self.compiled_dump_fields = None
+
+    def fast_load(self, data, unknown):
+        result = self.dict_class()
+        for name, check, field in self.compiled_load_fields:
+            if name not in data:
+                continue
+            value = data[name]
+            if check is None:
+                value = field.deserialize(value, name, data)
+            elif type(value) is not str or (check is not str and value not in check):
+                raise UseSlowPath()
+            result[name] = value
+        if len(result) < len(data):
+            unknown_names = [name for name in data if name not in self.load_fields]
+            if unknown_names and unknown == RAISE:
+                raise UseSlowPath()
+            if unknown == INCLUDE:
+                for name in unknown_names:
+                    result[name] = data[name]
+        return result
+
+    def load(self, data, *, many=None, partial=None, unknown=None):
+        many = self.many if many is None else many
+        partial = self.partial if partial is None else partial
+        if self.compiled_load_fields is not None and not many and not partial and isinstance(data, dict):
+            try:
+                return self.fast_load(data, unknown or self.unknown)
+            except (UseSlowPath, ValidationError):
+                pass
+        return super().load(data, many=many, partial=partial, unknown=unknown)
+
+    def fast_dump(self, obj):
+        result = self.dict_class()
+        for name, check, field in self.compiled_dump_fields:
+            if name not in obj:
+                continue
+            value = obj[name]
+            if check is None or type(value) is not str:
+                value = field.serialize(name, obj)
+            result[name] = value
+        return result
+
+    def dump(self, obj, *, many=None):
+        many = self.many if many is None else many
+        if self.compiled_dump_fields is not None and not many and isinstance(obj, collections.abc.Mapping):
+            try:
+                return self.fast_dump(obj)
+            except Exception:  # noqa: B902
+                pass
+        return super().dump(obj, many=many)
+
+
 schemes_map = {
     "ECO4": "Energy Company Obligation 4",
     "GBIS": "Great British Insulation Scheme",
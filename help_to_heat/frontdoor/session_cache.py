@@ -0,0 +1,127 @@
+import contextlib
+import contextvars
+import copy
+import functools
+import logging
+
+from django.db import connection
+
+from help_to_heat import utils
+
+logger = logging.getLogger(__name__)
+
+_current_cache = contextvars.ContextVar("session_cache", default=None)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class SessionCache:
+    """Session reads made while handling one request, grouped by session so a write can drop them"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.hits = 0
+        self.misses = 0
+        self.queries_saved = 0
+
+    def get(self, session_id, key, load):
+        entries = self.sessions.setdefault(session_id, {})
+        if key in entries:
+            value, queries = entries[key]
+            self.hits += 1
+            self.queries_saved += queries
+        else:
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                value = load()
+            entries[key] = (value, counter.count)
+            self.misses += 1
+        return copy.deepcopy(value)
+
+    def invalidate(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+
+def get_cache():
+    return _current_cache.get()
+
+
+@contextlib.contextmanager
+def activated():
+    cache = SessionCache()
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
+
+
+def get_session_id(bind, args, kwargs):
+    arguments = bind(*args, **kwargs)
+    arguments.pop("self", None)
+    return str(arguments["session_id"]), arguments
+
+
+def memoise(func):
+    """Cache the result for the rest of the request, keyed on the function's arguments"""
+    bind = utils.get_binder(func)
+
+    @functools.wraps(func)
+    def _inner(*args, **kwargs):
+        cache = get_cache()
+        if cache is None:
+            return func(*args, **kwargs)
+        session_id, arguments = get_session_id(bind, args, kwargs)
+        key = (func.__name__,) + tuple(str(value) for value in arguments.values())
+        return cache.get(session_id, key, lambda: func(*args, **kwargs))
+
+    return _inner
+
+
+def invalidates(func):
+    """Drop cached results for the session once the function has changed it"""
+    bind = utils.get_binder(func)
+
+    @functools.wraps(func)
+    def _inner(*args, **kwargs):
+        cache = get_cache()
+        if cache is None:
+            return func(*args, **kwargs)
+        session_id, _ = get_session_id(bind, args, kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            cache.invalidate(session_id)
+
+    return _inner
+
+
+def session_cache_middleware(get_response):
+    def middleware(request):
+        with activated() as cache:
+            response = get_response(request)
+        if cache.hits or cache.misses:
+            logger.info(
+                "Session cache for %s %s: %d hits, %d misses (%.0f%% hit rate), %d queries saved",
+                request.method,
+                request.path,
+                cache.hits,
+                cache.misses,
+                cache.hit_rate * 100,
+                cache.queries_saved,
+            )
+        return response
+
+    return middleware
@@ -0,0 +1,198 @@
+import datetime
+import gzip
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from help_to_heat import portal
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+
+class PurgeStats:
+    def __init__(self):
+        self.rows = {}
+        self.bytes_freed = 0
+        self.sessions = 0
+        self.started_at = time.monotonic()
+
+    def record(self, table, sizes):
+        self.rows[table] = self.rows.get(table, 0) + len(sizes)
+        self.bytes_freed += sum(sizes)
+
+    @property
+    def total_rows(self):
+        return sum(self.rows.values())
+
+    @property
+    def rate(self):
+        return self.total_rows / max(time.monotonic() - self.started_at, 1e-6)
+
+    def __str__(self):
+        counts = ", ".join(f"{count} from {table}" for table, count in self.rows.items())
+        return (
+            f"Purged {self.sessions} sessions: {counts or 'nothing'} ({self.rate:.0f} rows/sec, "
+            f"{self.bytes_freed / 1024 / 1024:.1f}MB of rows freed for reuse)"
+        )
+
+
+def get_table_sizes(cursor, tables):
+    cursor.execute("SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname = ANY(%s)", [list(tables)])
+    return dict(cursor.fetchall())
+
+
+def get_session_tables():
+    """The other tables holding session data, with how to match their rows to a session and the column
+    dating them. Idle sessions have nothing after the cutoff, which also limits events to older partitions."""
+    return (
+        (models.SessionState._meta.db_table, "session_id", "uuid[]", "modified_at"),
+        (models.AnswerHistory._meta.db_table, "session_id", "uuid[]", "answered_at"),
+        (models.AddressSearchResults._meta.db_table, "session_id", "uuid[]", "modified_at"),
+        (models.Event._meta.db_table, "(data ->> 'session_id')", "text[]", "created_at"),
+    )
+
+
+def archive_answers(archive, rows):
+    for _, session_id, page_name, data, created_at, _ in rows:
+        data = json.loads(data) if isinstance(data, str) else data
+        record = {"session_id": session_id, "page_name": page_name, "data": data, "created_at": created_at}
+        archive.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+
+
+def purge_chunk(cursor, cutoff, chunk_size, stats, archive=None, after=None):
+    """Delete a chunk of answers from sessions that were last active before `cutoff` and never referred,
+    then everything else belonging to those sessions once they have no answers left.
+
+    Answers are walked in (created_at, id) order starting after the `after` key, so answers that were kept
+    by earlier chunks aren't looked at again. Returns how many answers were deleted and the key to carry on from.
+
+    Rows that another transaction has locked are skipped, so this never waits on live requests."""
+    answer_table = models.Answer._meta.db_table
+    referral_table = portal.models.Referral._meta.db_table
+    after_clause = "AND (a.created_at, a.id) > (%(after_created_at)s, %(after_id)s)" if after else ""
+    after_created_at, after_id = after or (None, None)
+    cursor.execute(
+        f"""
+        DELETE FROM {answer_table} WHERE id IN (
+            SELECT a.id FROM {answer_table} a
+            WHERE a.created_at < %(cutoff)s
+            {after_clause}
+            AND NOT EXISTS (SELECT 1 FROM {referral_table} r WHERE r.session_id = a.session_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM {answer_table} b WHERE b.session_id = a.session_id AND b.created_at >= %(cutoff)s
+            )
+            ORDER BY a.created_at, a.id
+            LIMIT %(chunk_size)s
+            FOR UPDATE OF a SKIP LOCKED
+        )
+        RETURNING id, session_id, page_name, data, created_at, pg_column_size({answer_table}.*)
+        """,
+        {
+            "cutoff": cutoff,
+            "chunk_size": chunk_size,
+            "after_created_at": after_created_at,
+            "after_id": after_id,
+        },
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return 0, after
+    if archive:
+        archive_answers(archive, rows)
+    stats.record(answer_table, [row[-1] for row in rows])
+    session_ids = list({str(row[1]) for row in rows})
+
+    cursor.execute(
+        f"""
+        SELECT s::text FROM unnest(%s::uuid[]) s
+        WHERE NOT EXISTS (SELECT 1 FROM {answer_table} a WHERE a.session_id = s)
+        """,
+        [session_ids],
+    )
+    finished_session_ids = [session_id for (session_id,) in cursor.fetchall()]
+    for table, session_id_column, array_type, date_column in get_session_tables():
+        cursor.execute(
+            f"""
+            DELETE FROM {table} WHERE {session_id_column} = ANY(%s::{array_type}) AND {date_column} < %s
+            RETURNING pg_column_size({table}.*)
+            """,
+            [finished_session_ids, cutoff],
+        )
+        stats.record(table, [size for (size,) in cursor.fetchall()])
+    stats.sessions += len(finished_session_ids)
+    return len(rows), max((created_at, answer_id) for (answer_id, _, _, _, created_at, _) in rows)
+
+
+def purge_address_searches(cursor, chunk_size, stats):
+    """Delete cached address searches older than ADDRESS_CACHE_TTL, which are never served again"""
+    address_search_table = models.AddressSearch._meta.db_table
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.ADDRESS_CACHE_TTL)
+    while True:
+        with transaction.atomic():
+            cursor.execute(
+                f"""
+                DELETE FROM {address_search_table} WHERE text IN (
+                    SELECT text FROM {address_search_table} WHERE modified_at < %s
+                    LIMIT %s FOR UPDATE SKIP LOCKED
+                )
+                RETURNING pg_column_size({address_search_table}.*)
+                """,
+                [cutoff, chunk_size],
+            )
+            sizes = [size for (size,) in cursor.fetchall()]
+        stats.record(address_search_table, sizes)
+        if len(sizes) < chunk_size:
+            return
+
+
+def purge_sessions(ttl_days=None, chunk_size=CHUNK_SIZE, archive_path=None, vacuum=False):
+    ttl_days = settings.SESSION_TTL_DAYS if ttl_days is None else ttl_days
+    cutoff = timezone.now() - datetime.timedelta(days=ttl_days)
+    tables = [models.Answer._meta.db_table] + [table for table, _, _, _ in get_session_tables()]
+    tables.append(models.AddressSearch._meta.db_table)
+    stats = PurgeStats()
+    archive = gzip.open(archive_path, "at", encoding="utf-8") if archive_path else None
+    print(f"Purging sessions idle since {cutoff:%Y-%m-%d %H:%M} in chunks of {chunk_size}")  # noqa: T201
+    try:
+        with connection.cursor() as cursor:
+            sizes_before = get_table_sizes(cursor, tables)
+            after = None
+            while True:
+                with transaction.atomic():
+                    purged, after = purge_chunk(cursor, cutoff, chunk_size, stats, archive, after)
+                if archive:
+                    archive.flush()
+                if purged < chunk_size:
+                    break
+                logger.info("%s", stats)
+            purge_address_searches(cursor, chunk_size, stats)
+            if vacuum and stats.total_rows:
+                for table in tables:
+                    cursor.execute(f"VACUUM ANALYZE {table}")
+            sizes_after = get_table_sizes(cursor, tables)
+    finally:
+        if archive:
+            archive.close()
+    print(stats)  # noqa: T201
+    for table in tables:
+        before, after = sizes_before.get(table, 0), sizes_after.get(table, 0)
+        print(f"{table}: {before / 1024 / 1024:.1f}MB -> {after / 1024 / 1024:.1f}MB")  # noqa: T201
+    return stats
+
+
+def run_purger(interval=None, **kwargs):
+    """Purge once, or every `interval` seconds if one is given"""
+    while True:
+        purge_sessions(**kwargs)
+        if not interval:
+            return
+        time.sleep(interval)
@@ -1,5 +1,7 @@
+import logging
 import uuid
 
+import requests
 from django.conf import settings
 from django.shortcuts import redirect, render
 from django.urls import reverse
@@ -8,7 +10,9 @@ from marshmallow import ValidationError
 from help_to_heat import utils
 
 from ..portal import email_handler
-from . import eligibility, interface, schemas
+from . import circuit_breaker, eligibility, interface, os_places, schemas
+
+logger = logging.getLogger(__name__)
 
 page_map = {}
 
@@ -197,18 +201,37 @@ class AddressView(PageView):
         return redirect("frontdoor:page", session_id=session_id, page_name="address-select")
 
 
+ADDRESS_LOOKUP_ERRORS = (circuit_breaker.CircuitOpen, os_places.PlacesError, requests.RequestException)
+
+
 @register_page("address-select")
 class AddressSelectView(PageView):
+    def get(self, request, session_id, *args, **kwargs):
+        try:
+            return super().get(request, session_id, *args, **kwargs)
+        except ADDRESS_LOOKUP_ERRORS:
+            return self.enter_manually(session_id)
+
+    def post(self, request, session_id, *args, **kwargs):
+        try:
+            return super().post(request, session_id, *args, **kwargs)
+        except ADDRESS_LOOKUP_ERRORS:
+            return self.enter_manually(session_id)
+
+    def enter_manually(self, session_id):
+        logger.warning("Address lookup failed, sending session %s to address-manual", session_id, exc_info=True)
+        return redirect("frontdoor:page", session_id=session_id, page_name="address-manual")
+
     def get_context(self, request, session_id, *args, **kwargs):
         data = interface.api.session.get_answer(session_id, "address")
         text = f"{data['address_line_1'], data['postcode']}"
-        addresses = interface.api.address.find_addresses(text)
+        addresses = interface.api.address.search_addresses(session_id, text)
         uprn_options = tuple({"value": a["uprn"], "label": a["address"]} for a in addresses)
         return {"uprn_options": uprn_options}
 
     def save_data(self, request, session_id, page_name, *args, **kwargs):
         uprn = request.POST["uprn"]
-        data = interface.api.address.get_address(uprn)
+        data = interface.api.address.select_address(session_id, uprn)
         data = interface.api.session.save_answer(session_id, page_name, data)
         return data
 
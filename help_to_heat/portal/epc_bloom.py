@@ -0,0 +1,117 @@
+import hashlib
+import math
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from help_to_heat import utils
+from help_to_heat.portal import models
+
+MAGIC = b"EPCBLOOM"
+HEADER = struct.Struct("=8sQQQd")
+FETCH_SIZE = 100_000
+
+
+def normalise_uprn(uprn):
+    uprn = str(uprn).strip()
+    if uprn.isdigit():
+        uprn = str(int(uprn))
+    return uprn.encode("utf-8")
+
+
+class BloomFilter:
+    """A set of UPRNs that can answer "definitely not present" without a database query"""
+
+    def __init__(self, size, hashes, bits=None, count=0, false_positive_rate=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.count = count
+        self.false_positive_rate = false_positive_rate
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate):
+        capacity = max(capacity, 1)
+        size = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes, false_positive_rate=false_positive_rate)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, hashes, count, false_positive_rate = HEADER.unpack_from(bits)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an EPC bloom filter")
+        bits = memoryview(bits)[HEADER.size :]
+        return cls(size, hashes, bits=bits, count=count, false_positive_rate=false_positive_rate)
+
+    def positions(self, uprn):
+        digest = hashlib.blake2b(normalise_uprn(uprn), digest_size=16).digest()
+        first, second = struct.unpack("=QQ", digest)
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, uprn):
+        for position in self.positions(uprn):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, uprn):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(uprn))
+
+    @property
+    def estimated_false_positive_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def save(self, path):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+            f.write(HEADER.pack(MAGIC, self.size, self.hashes, self.count, self.false_positive_rate or 0))
+            f.write(self.bits)
+        os.replace(f.name, path)
+
+
+_bloom_filters = utils.FileCache(BloomFilter.load)
+
+
+def get_bloom_filter():
+    """The filter at EPC_BLOOM_FILTER_PATH, reloaded when the file is replaced, or None if there isn't one"""
+    return _bloom_filters.get(settings.EPC_BLOOM_FILTER_PATH)
+
+
+def build_bloom_filter(path, false_positive_rate):
+    epc_table = models.EpcRating._meta.db_table
+    started_at = time.monotonic()
+    print(f"Building EPC bloom filter at {path}")  # noqa: T201
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {epc_table}")
+        capacity = cursor.fetchone()[0]
+    bloom_filter = BloomFilter.for_capacity(capacity, false_positive_rate)
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(f"SELECT uprn FROM {epc_table}")
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for (uprn,) in rows:
+                bloom_filter.add(uprn)
+    bloom_filter.save(path)
+    duration = time.monotonic() - started_at
+    print(  # noqa: T201
+        f"Added {bloom_filter.count} UPRNs to {bloom_filter.size} bits with {bloom_filter.hashes} hashes "
+        f"in {duration:.1f}s, false positive rate {bloom_filter.estimated_false_positive_rate:.4%} "
+        f"(configured {false_positive_rate:.4%})"
+    )
+    return bloom_filter
+
+
+def build_configured_bloom_filter():
+    if settings.EPC_BLOOM_FILTER_PATH:
+        return build_bloom_filter(settings.EPC_BLOOM_FILTER_PATH, settings.EPC_BLOOM_FALSE_POSITIVE_RATE)
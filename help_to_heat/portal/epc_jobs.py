@@ -0,0 +1,140 @@
+import datetime
+import logging
+import threading
+import time
+import traceback
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from help_to_heat.portal import epc_writer, models
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 2
+HEARTBEAT_INTERVAL = 60
+POLL_INTERVAL = 10
+STALE_AFTER = datetime.timedelta(minutes=30)
+
+
+class ImportAlreadyActive(Exception):
+    pass
+
+
+class JobProgress:
+    """Records the progress of an import onto its job, at most once every `interval` seconds"""
+
+    def __init__(self, job, interval=PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.phase = None
+        self.phase_started_at = None
+        self.saved_at = None
+
+    def __call__(self, phase, bytes_processed=None, rows_processed=None):
+        now = time.monotonic()
+        if phase != self.phase:
+            self.phase = phase
+            self.phase_started_at = now
+        elif now - self.saved_at < self.interval:
+            return
+        self.saved_at = now
+        fields = {"phase": phase}
+        if bytes_processed is not None:
+            fields["bytes_processed"] = bytes_processed
+        if rows_processed is not None:
+            fields["rows_processed"] = rows_processed
+        processed = rows_processed if rows_processed is not None else bytes_processed or 0
+        fields["rate"] = processed / max(now - self.phase_started_at, 1)
+        self.job.update_progress(**fields)
+
+
+class Heartbeat:
+    """Touches the job every `interval` seconds while it runs, so phases that report no progress, such as
+    merging sort runs, building indexes and swapping tables, don't make a long import look stale"""
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, name="epc-import-heartbeat", daemon=True)
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    models.EpcImportJob.objects.filter(pk=self.job.pk).update(modified_at=timezone.now())
+                except Exception:  # noqa: B902
+                    logger.exception("Couldn't record a heartbeat for EPC import %s", self.job.id)
+                    connection.close()
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def get_active_job():
+    cutoff = timezone.now() - STALE_AFTER
+    active_jobs = models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING"))
+    return active_jobs.filter(modified_at__gte=cutoff).first()
+
+
+def fail_stale_jobs():
+    cutoff = timezone.now() - STALE_AFTER
+    stale_jobs = models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING"), modified_at__lt=cutoff)
+    return stale_jobs.update(
+        status="FAILED", error="Worker stopped responding", finished_at=timezone.now(), modified_at=timezone.now()
+    )
+
+
+def create_job(url):
+    fail_stale_jobs()
+    if get_active_job():
+        raise ImportAlreadyActive()
+    try:
+        with transaction.atomic():
+            return models.EpcImportJob.objects.create(url=url)
+    except IntegrityError:
+        raise ImportAlreadyActive()
+
+
+def claim_job():
+    with transaction.atomic():
+        jobs = models.EpcImportJob.objects.select_for_update(skip_locked=True).filter(status="PENDING")
+        job = jobs.order_by("created_at").first()
+        if job:
+            job.update_progress(status="RUNNING", started_at=timezone.now())
+    return job
+
+
+def run_job(job):
+    logger.info("Starting EPC import %s from %s", job.id, job.url)
+    try:
+        with Heartbeat(job):
+            epc_writer.import_epc_ratings(job.url, bulk=True, progress=JobProgress(job))
+            epc_writer.build_lookup_files()
+    except Exception:  # noqa: B902
+        logger.exception("EPC import %s failed", job.id)
+        job.update_progress(status="FAILED", error=traceback.format_exc(), finished_at=timezone.now())
+    else:
+        logger.info("Finished EPC import %s", job.id)
+        job.update_progress(status="COMPLETE", finished_at=timezone.now())
+    return job
+
+
+def run_worker(once=False, poll_interval=POLL_INTERVAL):
+    while True:
+        fail_stale_jobs()
+        job = claim_job()
+        if job:
+            run_job(job)
+        elif once:
+            return
+        else:
+            time.sleep(poll_interval)
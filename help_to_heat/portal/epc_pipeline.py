@@ -0,0 +1,216 @@
+import bz2
+import codecs
+import csv
+import queue
+import threading
+import time
+
+import httpx
+from django.db import connection, transaction
+
+from help_to_heat.portal import epc_writer
+
+QUEUE_SIZE = 64
+QUEUE_TIMEOUT = 0.1
+REPORT_INTERVAL = 10
+
+_done = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.processed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    def record(self, amount):
+        self.processed += amount
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self):
+        return self.processed / max(self.duration, 1e-6)
+
+    def __str__(self):
+        return f"{self.name}: {self.processed} {self.unit} in {self.duration:.1f}s ({self.rate:.0f} {self.unit}/sec)"
+
+
+class Pipeline:
+    """Runs generator stages in threads, connected by bounded queues.
+
+    Each stage takes an iterator of its predecessor's output and yields its own,
+    so every stage works concurrently and the slowest one sets the pace."""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stopped = threading.Event()
+        self.errors = []
+        self.threads = []
+        self.stats = []
+
+    def fail(self, error):
+        self.errors.append(error)
+        self.stopped.set()
+
+    def put(self, outbox, item):
+        while not self.stopped.is_set():
+            try:
+                outbox.put(item, timeout=QUEUE_TIMEOUT)
+                return
+            except queue.Full:
+                pass
+        raise PipelineStopped()
+
+    def iterate(self, inbox):
+        while not self.stopped.is_set():
+            try:
+                item = inbox.get(timeout=QUEUE_TIMEOUT)
+            except queue.Empty:
+                continue
+            if item is _done:
+                return
+            yield item
+        raise PipelineStopped()
+
+    def add_stage(self, name, unit, func, inbox=None):
+        outbox = queue.Queue(self.queue_size)
+        stats = StageStats(name, unit)
+        self.stats.append(stats)
+
+        def _run():
+            stats.start()
+            try:
+                items = func(self.iterate(inbox)) if inbox else func()
+                for item in items:
+                    stats.record(len(item))
+                    self.put(outbox, item)
+                self.put(outbox, _done)
+            except PipelineStopped:
+                pass
+            except Exception as e:  # noqa: B902
+                self.fail(e)
+            finally:
+                stats.finish()
+
+        thread = threading.Thread(target=_run, name=f"epc-pipeline-{name}", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return outbox
+
+    def consume(self, name, unit, func, inbox):
+        """Run the final stage in the calling thread, so it can use this thread's database connection"""
+        stats = StageStats(name, unit)
+        self.stats.append(stats)
+        stats.start()
+        try:
+            for item in self.iterate(inbox):
+                func(item)
+                stats.record(len(item))
+        except PipelineStopped:
+            pass
+        except Exception as e:  # noqa: B902
+            self.fail(e)
+        finally:
+            stats.finish()
+            self.stopped.set()
+            for thread in self.threads:
+                thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def report(self):
+        for stats in self.stats:
+            print(stats)  # noqa: T201
+
+
+def download(url):
+    def _download():
+        with httpx.stream("GET", url) as response:
+            response.raise_for_status()
+            yield from response.iter_bytes(epc_writer.CHUNK_SIZE)
+
+    return _download
+
+
+def decompress(chunks):
+    decompressor = bz2.BZ2Decompressor()
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = bz2.BZ2Decompressor()
+            else:
+                chunk = b""
+
+
+def split_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    remainder = ""
+    for chunk in chunks:
+        lines = (remainder + decoder.decode(chunk)).split("\n")
+        remainder = lines.pop()
+        yield from lines
+    remainder = remainder + decoder.decode(b"", final=True)
+    if remainder:
+        yield remainder
+
+
+def parse(batch_size):
+    def _parse(chunks):
+        rows = csv.DictReader(split_lines(chunks))
+        yield from epc_writer.batched(rows, batch_size)
+
+    return _parse
+
+
+def write_url_pipelined(url, batch_size=epc_writer.BATCH_SIZE, progress=epc_writer.no_progress):
+    """Download, decompress, parse and load an EPC file with every stage running at once.
+
+    The file is not sorted first, so rows are upserted only where they are at least as
+    recent as the stored rating, which makes the load independent of row order."""
+    print(f"Loading {url} through pipeline")  # noqa: T201
+    pipeline = Pipeline()
+    compressed = pipeline.add_stage("download", "bytes", download(url))
+    decompressed = pipeline.add_stage("decompress", "bytes", decompress, compressed)
+    batches = pipeline.add_stage("parse", "rows", parse(batch_size), decompressed)
+    download_stats = pipeline.stats[0]
+    total = 0
+    reported_at = time.monotonic()
+
+    with connection.cursor() as cursor:
+        epc_writer.create_load_table(cursor)
+
+        def _write(batch):
+            nonlocal total, reported_at
+            with transaction.atomic():
+                total += epc_writer.upsert_batch(cursor, epc_writer.LOAD_TABLE, batch, newer_only=True)
+            progress("LOAD", bytes_processed=download_stats.processed, rows_processed=total)
+            if time.monotonic() - reported_at >= REPORT_INTERVAL:
+                reported_at = time.monotonic()
+                pipeline.report()
+
+        pipeline.consume("write", "rows", _write, batches)
+
+    pipeline.report()
+    print(f"Finished loading {total} rows")  # noqa: T201
+    return total
@@ -0,0 +1,123 @@
+import array
+import bisect
+import datetime
+import mmap
+import os
+import pathlib
+import shutil
+import struct
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from help_to_heat import utils
+from help_to_heat.portal import models
+
+MAGIC = b"EPCSNAP1"
+HEADER = struct.Struct("=8sQ")
+EPOCH = datetime.date(1970, 1, 1)
+NO_DATE = 0xFFFF
+FETCH_SIZE = 100_000
+
+
+class EpcSnapshot:
+    """Ratings held in a file as sorted uint64 UPRNs, uint16 day offsets from 1970 and 1 byte ratings.
+
+    The file is memory mapped, so every worker process on an instance shares the same pages."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        with self.path.open("rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an EPC snapshot")
+        view = memoryview(self.mmap)
+        uprns_start = HEADER.size
+        days_start = uprns_start + 8 * count
+        ratings_start = days_start + 2 * count
+        self.count = count
+        self.uprns = view[uprns_start:days_start].cast("Q")
+        self.days = view[days_start:ratings_start].cast("H")
+        self.ratings = view[ratings_start : ratings_start + count]
+
+    def __len__(self):
+        return self.count
+
+    def get(self, uprn):
+        uprn = int(uprn)
+        index = bisect.bisect_left(self.uprns, uprn)
+        if index == self.count or self.uprns[index] != uprn:
+            return None
+        days = self.days[index]
+        rating = self.ratings[index]
+        return {
+            "uprn": uprn,
+            "rating": rating and chr(rating) or None,
+            "date": None if days == NO_DATE else EPOCH + datetime.timedelta(days=days),
+        }
+
+
+_snapshots = utils.FileCache(EpcSnapshot)
+
+
+def get_snapshot():
+    """The snapshot at EPC_SNAPSHOT_PATH, reopened when the file is replaced, or None if there isn't one"""
+    return _snapshots.get(settings.EPC_SNAPSHOT_PATH)
+
+
+def write_array(f, typecode, values):
+    f.write(array.array(typecode, values).tobytes())
+
+
+def build_snapshot(path):
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    epc_table = models.EpcRating._meta.db_table
+    count = 0
+    started_at = time.monotonic()
+    print(f"Building EPC snapshot at {path}")  # noqa: T201
+    with tempfile.TemporaryDirectory(dir=path.parent) as temp_dir:
+        temp_dir = pathlib.Path(temp_dir)
+        snapshot_path = temp_dir / path.name
+        days_path = temp_dir / "days"
+        ratings_path = temp_dir / "ratings"
+        with snapshot_path.open("wb") as f, days_path.open("wb") as days_f, ratings_path.open("wb") as ratings_f:
+            f.write(HEADER.pack(MAGIC, 0))
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT uprn, coalesce(ascii(rating), 0), coalesce(date - %s, %s)
+                    FROM {epc_table}
+                    WHERE uprn >= 0
+                    ORDER BY uprn
+                    """,
+                    [EPOCH, NO_DATE],
+                )
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    uprns, ratings, days = zip(*rows)
+                    write_array(f, "Q", uprns)
+                    write_array(days_f, "H", (day if 0 <= day < NO_DATE else NO_DATE for day in days))
+                    write_array(ratings_f, "B", ratings)
+                    count += len(rows)
+            days_f.flush()
+            ratings_f.flush()
+            for part_path in (days_path, ratings_path):
+                with part_path.open("rb") as part_f:
+                    shutil.copyfileobj(part_f, f)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, count))
+        os.replace(snapshot_path, path)
+    duration = time.monotonic() - started_at
+    print(f"Wrote {count} ratings ({path.stat().st_size} bytes) in {duration:.1f}s")  # noqa: T201
+    return count
+
+
+def build_configured_snapshot():
+    if settings.EPC_SNAPSHOT_PATH:
+        return build_snapshot(settings.EPC_SNAPSHOT_PATH)
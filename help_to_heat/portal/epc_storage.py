@@ -0,0 +1,94 @@
+import time
+
+from django.db import connection
+
+from help_to_heat import utils
+from help_to_heat.portal import models
+
+LOOKUP_SAMPLES = 1000
+
+
+def measure_storage(cursor, table):
+    cursor.execute(f"ANALYZE {table}")
+    cursor.execute(
+        """
+        SELECT pg_relation_size(c.oid), pg_indexes_size(c.oid), pg_total_relation_size(c.oid), c.reltuples::bigint
+        FROM pg_class c
+        WHERE c.relname = %s
+        """,
+        [table],
+    )
+    table_bytes, index_bytes, total_bytes, estimated_rows = cursor.fetchone()
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s ORDER BY ordinal_position",
+        [table],
+    )
+    columns = dict(cursor.fetchall())
+    return {
+        "table_bytes": table_bytes,
+        "index_bytes": index_bytes,
+        "total_bytes": total_bytes,
+        "estimated_rows": max(estimated_rows, 0),
+        "bytes_per_row": total_bytes / estimated_rows if estimated_rows > 0 else None,
+        "columns": columns,
+    }
+
+
+def sample_uprns(cursor, table, samples, estimated_rows):
+    percent = min(100.0, 100.0 * samples * 4 / max(estimated_rows, 1))
+    cursor.execute(f"SELECT uprn FROM {table} TABLESAMPLE SYSTEM (%s) LIMIT %s", [percent, samples])
+    return [str(uprn) for (uprn,) in cursor.fetchall()]
+
+
+def time_lookups(cursor, table, uprns):
+    durations = []
+    for uprn in uprns:
+        started_at = time.perf_counter()
+        cursor.execute(f"SELECT rating, date FROM {table} WHERE uprn = %s", [uprn])
+        cursor.fetchone()
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return {
+        "lookups": len(durations),
+        "p50_ms": utils.percentile(durations, 0.5),
+        "p99_ms": utils.percentile(durations, 0.99),
+    }
+
+
+def measure(samples=LOOKUP_SAMPLES):
+    """Sizes of the EPC table and its indexes, and the latency of primary key lookups for ratings that
+    exist and ones that don't. Works on either the text or integer keyed table, so it can be run either
+    side of a migration."""
+    table = models.EpcRating._meta.db_table
+    with connection.cursor() as cursor:
+        report = measure_storage(cursor, table)
+        uprns = sample_uprns(cursor, table, samples, report["estimated_rows"])
+        report["hits"] = time_lookups(cursor, table, uprns)
+        report["misses"] = time_lookups(cursor, table, [f"9{uprn}"[:18] for uprn in uprns])
+    return report
+
+
+def flatten(report, prefix=""):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def format_report(report, before=None):
+    before = dict(flatten(before)) if before else {}
+    for key, value in flatten(report):
+        line = f"{key}: {format_value(value)}"
+        if key in before:
+            previous = before[key]
+            line = f"{key}: {format_value(previous)} -> {format_value(value)}"
+            is_number = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (previous, value))
+            if is_number and previous:
+                line = f"{line} ({(value - previous) / previous:+.1%})"
+        yield line
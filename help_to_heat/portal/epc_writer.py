@@ -1,18 +1,77 @@
 import bz2
 import csv
 import datetime
+import hashlib
+import heapq
+import io
+import itertools
+import os
 import pathlib
+import re
+import sys
+import tempfile
+import time
 
 import httpx
 from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Max
 
-from help_to_heat.portal import models
+from help_to_heat.portal import epc_bloom, epc_snapshot, models
 
 DATA_DIR = settings.BASE_DIR / "temp-data"
 CHUNK_SIZE = 16 * 1024
+BATCH_SIZE = 50_000
+SORT_BUFFER_SIZE = 64 * 1024 * 1024
+MERGE_FAN_IN = 64
+LOAD_TABLE = "portal_epcrating_load"
+SWAP_LOCK_TIMEOUT = "5s"
+SWAP_ATTEMPTS = 5
+PROGRESS_LINES = 100_000
+MAX_UPRN_DIGITS = 18
+VALID_RATINGS = frozenset(letter for (letter, _) in models.epc_rating_choices)
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+LAST_LINE_SIZE = 4096
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
 
 
-def save_url_in_chunks(url):
+def no_progress(phase, **counts):
+    pass
+
+
+def import_epc_ratings(
+    url,
+    bulk=False,
+    full_refresh=False,
+    batch_size=BATCH_SIZE,
+    sort_buffer_size=SORT_BUFFER_SIZE,
+    progress=no_progress,
+):
+    sorted_filepath = save_url_in_chunks(url, sort_buffer_size=sort_buffer_size, progress=progress)
+    checksum = file_checksum(sorted_filepath)
+    if full_refresh:
+        total = write_rows_full_refresh(read_rows(sorted_filepath), batch_size=batch_size, progress=progress)
+    else:
+        state = get_import_state()
+        if state and state.checksum == checksum:
+            print(f"Skipping load: {sorted_filepath} was already loaded on {state.created_at:%Y-%m-%d}")  # noqa: T201
+            return 0
+        latest_date = get_latest_date()
+        rows = read_rows(sorted_filepath, from_date=latest_date)
+        if bulk:
+            total = write_rows_bulk(rows, batch_size=batch_size, progress=progress, latest_date=latest_date)
+        else:
+            total = write_rows(rows, progress=progress, latest_date=latest_date)
+    record_import(url, checksum, get_last_date(sorted_filepath), total)
+    return total
+
+
+def build_lookup_files():
+    epc_snapshot.build_configured_snapshot()
+    epc_bloom.build_configured_bloom_filter()
+
+
+def save_url_in_chunks(url, sort_buffer_size=SORT_BUFFER_SIZE, progress=no_progress):
     decompressor = bz2.BZ2Decompressor()
     filename = pathlib.Path(url).stem
     filepath = DATA_DIR / filename
@@ -25,35 +84,155 @@ def save_url_in_chunks(url):
                 for chunk in response.iter_bytes(CHUNK_SIZE):
                     text = decompressor.decompress(chunk)
                     f.write(text)
+                    progress("DOWNLOAD", bytes_processed=response.num_bytes_downloaded)
     else:
         print(f"Skipping download: {filepath} already exists")  # noqa: T201
 
     sorted_filepath = DATA_DIR / "".join((filepath.stem, "-sorted", filepath.suffix))
     if not sorted_filepath.exists():
         print(f"Sorting to: {sorted_filepath}")  # noqa: T201
-        with filepath.open("r") as f:
-            lines = f.readlines()
-        header = lines[0]
-        lines = lines[1:]
-        lines.sort()
-        with sorted_filepath.open("w") as f:
-            f.writelines([header])
-            f.writelines(lines)
+        sort_file(filepath, sorted_filepath, buffer_size=sort_buffer_size, progress=progress)
     else:
         print(f"Skipping sort: {sorted_filepath} already exists")  # noqa: T201
     return sorted_filepath
 
 
-def read_rows(filepath):
-    with filepath.open() as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            yield row
+def read_runs(lines, buffer_size):
+    run = []
+    run_size = 0
+    for line in lines:
+        if not line.endswith("\n"):
+            line = line + "\n"
+        run.append(line)
+        run_size += sys.getsizeof(line) + 8
+        if run_size >= buffer_size:
+            yield run
+            run = []
+            run_size = 0
+    if run:
+        yield run
+
+
+def write_run(lines, directory):
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".run", delete=False) as f:
+        f.writelines(lines)
+    return pathlib.Path(f.name)
+
+
+def merge_runs(run_paths, directory):
+    run_files = [path.open("r") for path in run_paths]
+    try:
+        merged_path = write_run(heapq.merge(*run_files), directory)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+    for path in run_paths:
+        path.unlink()
+    return merged_path
+
+
+def report_lines(lines, progress, phase):
+    bytes_processed = 0
+    for count, line in enumerate(lines, 1):
+        bytes_processed += len(line)
+        if count % PROGRESS_LINES == 0:
+            progress(phase, bytes_processed=bytes_processed)
+        yield line
+    progress(phase, bytes_processed=bytes_processed)
+
+
+def sort_file(filepath, sorted_filepath, buffer_size=SORT_BUFFER_SIZE, progress=no_progress):
+    """External merge sort, holding at most `buffer_size` bytes of lines in memory at once"""
+    with tempfile.TemporaryDirectory(dir=sorted_filepath.parent) as temp_dir:
+        with filepath.open("r") as f:
+            header = f.readline()
+            lines = report_lines(f, progress, "SORT")
+            run_paths = [write_run(sorted(run), temp_dir) for run in read_runs(lines, buffer_size)]
+        while len(run_paths) > MERGE_FAN_IN:
+            run_paths = [
+                merge_runs(run_paths[i : i + MERGE_FAN_IN], temp_dir) for i in range(0, len(run_paths), MERGE_FAN_IN)
+            ]
+        partial_filepath = pathlib.Path(temp_dir) / sorted_filepath.name
+        run_files = [path.open("r") for path in run_paths]
+        try:
+            with partial_filepath.open("w") as f:
+                f.write(header)
+                f.writelines(report_lines(heapq.merge(*run_files), progress, "SORT"))
+        finally:
+            for run_file in run_files:
+                run_file.close()
+        partial_filepath.replace(sorted_filepath)
+
+
+def file_checksum(filepath):
+    digest = hashlib.sha256()
+    with filepath.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def line_date(line):
+    return line.split(b",", 1)[0].decode("utf-8")
+
+
+def find_date_offset(f, start, end, date):
+    """Binary search a file of lines sorted by date, between byte offsets `start` and `end`,
+    for the offset of the first line dated `date` or later"""
+    low, high = start, end
+    while low < high:
+        f.seek((low + high) // 2)
+        f.readline()
+        offset = f.tell()
+        if offset >= high:
+            offset = low
+            f.seek(offset)
+        line = f.readline()
+        if line_date(line) < date:
+            low = offset + len(line)
+        else:
+            high = offset
+    return low
+
+
+def get_last_date(filepath):
+    with filepath.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - LAST_LINE_SIZE))
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    last_date = lines and line_date(lines[-1])
+    return last_date if DATE_PATTERN.fullmatch(last_date or "") else None
+
+
+def read_rows(filepath, from_date=None):
+    with filepath.open("rb") as f:
+        header = f.readline()
+        if from_date:
+            f.seek(find_date_offset(f, f.tell(), filepath.stat().st_size, from_date))
+        fieldnames = next(csv.reader([header.decode("utf-8")]))
+        yield from csv.DictReader(io.TextIOWrapper(f, encoding="utf-8", newline=""), fieldnames=fieldnames)
+
+
+def get_import_state():
+    return models.EpcImportState.objects.first()
+
+
+def record_import(url, checksum, last_date, total):
+    state = get_import_state()
+    if state and state.last_date and (not last_date or str(state.last_date) > last_date):
+        last_date = state.last_date
+    return models.EpcImportState.objects.create(url=url, checksum=checksum, last_date=last_date, rows_loaded=total)
 
 
 def get_latest_date():
-    if models.EpcRating.objects.exists():
-        latest_date = str(models.EpcRating.objects.latest("date").date)
+    state = get_import_state()
+    if state and state.last_date:
+        latest_date = str(state.last_date)
+    else:
+        dated_epcs = models.EpcRating.objects.filter(date__isnull=False)
+        latest_date = dated_epcs.aggregate(latest_date=Max("date"))["latest_date"]
+        latest_date = latest_date and str(latest_date)
+    if latest_date:
         print(f"Resuming from {latest_date}")  # noqa: T201
     else:
         latest_date = str(datetime.date(1970, 1, 1))
@@ -61,13 +240,205 @@ def get_latest_date():
     return latest_date
 
 
-def write_rows(rows):
+def write_rows(rows, progress=no_progress, latest_date=None):
     print("Loading to database")  # noqa: T201
-    latest_date = get_latest_date()
-    for row in rows:
-        if row["date"] >= latest_date:
-            models.EpcRating.objects.update_or_create(
-                uprn=row["uprn"],
-                defaults={"rating": row["epc_rating"], "date": row["date"]},
-            )
+    if latest_date is None:
+        latest_date = get_latest_date()
+    total = 0
+    for row in rows_from(rows, latest_date):
+        if not is_valid_row(row):
+            continue
+        models.EpcRating.objects.update_or_create(
+            uprn=row["uprn"],
+            defaults={"rating": row["epc_rating"], "date": row["date"]},
+        )
+        total += 1
+        progress("LOAD", rows_processed=total)
     print("Finished loading")  # noqa: T201
+    return total
+
+
+def is_valid_uprn(uprn):
+    return uprn.isdigit() and len(uprn) <= MAX_UPRN_DIGITS
+
+
+def is_valid_row(row):
+    """Whether the row fits the EpcRating table, so one bad row can't fail a whole COPY"""
+    return is_valid_uprn(row["uprn"]) and row["epc_rating"] in VALID_RATINGS
+
+
+def modified_at_value():
+    """The SQL expression for modified_at, which is only recorded when EPC_AUDIT_TIMESTAMPS is set"""
+    return "now()" if settings.EPC_AUDIT_TIMESTAMPS else "NULL"
+
+
+def rows_from(rows, latest_date):
+    return (row for row in rows if row["date"] >= latest_date)
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = tuple(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_batch(cursor, table, batch):
+    """Copy the valid rows in the batch into `table`, returning how many there were"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in batch:
+        if not is_valid_row(row):
+            continue
+        writer.writerow((row["uprn"], row["epc_rating"], row["date"] or None))
+        count += 1
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} (uprn, rating, date) FROM STDIN WITH (FORMAT csv)", buffer)
+    return count
+
+
+def create_load_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {LOAD_TABLE}
+        (uprn bigint, rating varchar(32), date date)
+        ON COMMIT DELETE ROWS
+        """
+    )
+
+
+def upsert_batch(cursor, table, batch, newer_only=False):
+    epc_table = models.EpcRating._meta.db_table
+    count = copy_batch(cursor, table, batch)
+    if newer_only:
+        condition = f"WHERE {epc_table}.date IS NULL OR {epc_table}.date <= EXCLUDED.date"
+    else:
+        condition = ""
+    cursor.execute(
+        f"""
+        INSERT INTO {epc_table} (uprn, rating, date, modified_at)
+        SELECT DISTINCT ON (uprn) uprn, rating, date, {modified_at_value()}
+        FROM {table}
+        ORDER BY uprn, date DESC NULLS LAST
+        ON CONFLICT (uprn) DO UPDATE
+        SET rating = EXCLUDED.rating, date = EXCLUDED.date, modified_at = EXCLUDED.modified_at
+        {condition}
+        """
+    )
+    return count
+
+
+def write_rows_bulk(rows, batch_size=BATCH_SIZE, progress=no_progress, latest_date=None):
+    print(f"Bulk loading to database in batches of {batch_size}")  # noqa: T201
+    if latest_date is None:
+        latest_date = get_latest_date()
+    total = 0
+    started_at = time.monotonic()
+    with connection.cursor() as cursor:
+        create_load_table(cursor)
+        for batch in batched(rows_from(rows, latest_date), batch_size):
+            with transaction.atomic():
+                total += upsert_batch(cursor, LOAD_TABLE, batch)
+            progress("LOAD", rows_processed=total)
+            rate = total / (time.monotonic() - started_at)
+            print(f"Loaded {total} rows ({rate:.0f} rows/sec)")  # noqa: T201
+    duration = time.monotonic() - started_at
+    print(f"Finished loading {total} rows in {duration:.1f}s")  # noqa: T201
+    return total
+
+
+def get_indexes(cursor, table):
+    cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [table])
+    return cursor.fetchall()
+
+
+def get_primary_key_name(cursor, table):
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def build_staging_indexes(cursor, epc_table, staging_table):
+    """Recreate the live table's indexes on the staging table, suffixed with `_staging`"""
+    primary_key_name = get_primary_key_name(cursor, epc_table)
+    index_names = []
+    for index_name, index_def in get_indexes(cursor, epc_table):
+        staging_index_name = f"{index_name}_staging"
+        staging_def = re.sub(
+            r"INDEX \S+ ON \S+ USING ", f"INDEX {staging_index_name} ON {staging_table} USING ", index_def, count=1
+        )
+        print(f"Building index {staging_index_name}")  # noqa: T201
+        cursor.execute(staging_def)
+        if index_name == primary_key_name:
+            cursor.execute(
+                f"ALTER TABLE {staging_table} ADD CONSTRAINT {staging_index_name} "
+                f"PRIMARY KEY USING INDEX {staging_index_name}"
+            )
+        index_names.append(index_name)
+    return index_names
+
+
+def swap_tables(cursor, epc_table, staging_table, old_table, index_names):
+    """Rename the staging table into place in one short transaction.
+
+    Retries rather than queueing behind long running queries, as queries against the
+    live table would otherwise queue behind the swap."""
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+                cursor.execute(f"ALTER TABLE {epc_table} RENAME TO {old_table}")
+                cursor.execute(f"ALTER TABLE {staging_table} RENAME TO {epc_table}")
+                for index_name in index_names:
+                    cursor.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}_old")
+                    cursor.execute(f"ALTER INDEX {index_name}_staging RENAME TO {index_name}")
+            return
+        except OperationalError:
+            print(f"Could not swap tables on attempt {attempt}")  # noqa: T201
+            if attempt == SWAP_ATTEMPTS:
+                raise
+
+
+def write_rows_full_refresh(rows, batch_size=BATCH_SIZE, progress=no_progress):
+    """Load every row into an unlogged staging table, index it, then swap it in for the live table"""
+    epc_table = models.EpcRating._meta.db_table
+    raw_table = f"{epc_table}_raw"
+    staging_table = f"{epc_table}_staging"
+    old_table = f"{epc_table}_old"
+    print(f"Loading to staging table {staging_table}")  # noqa: T201
+    total = 0
+    started_at = time.monotonic()
+    with connection.cursor() as cursor:
+        for table in (raw_table, staging_table, old_table):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {raw_table} (uprn bigint, rating varchar(32), date date)")
+        cursor.execute(f"CREATE UNLOGGED TABLE {staging_table} (LIKE {epc_table} INCLUDING DEFAULTS)")
+        for batch in batched(rows, batch_size):
+            total += copy_batch(cursor, raw_table, batch)
+            progress("LOAD", rows_processed=total)
+            rate = total / (time.monotonic() - started_at)
+            print(f"Copied {total} rows ({rate:.0f} rows/sec)")  # noqa: T201
+        cursor.execute(
+            f"""
+            INSERT INTO {staging_table} (uprn, rating, date, modified_at)
+            SELECT DISTINCT ON (uprn) uprn, rating, date, {modified_at_value()}
+            FROM {raw_table}
+            ORDER BY uprn, date DESC NULLS LAST
+            """
+        )
+        cursor.execute(f"DROP TABLE {raw_table}")
+        index_names = build_staging_indexes(cursor, epc_table, staging_table)
+        print("Writing staging table to WAL")  # noqa: T201
+        cursor.execute(f"ALTER TABLE {staging_table} SET LOGGED")
+        cursor.execute(f"ANALYZE {staging_table}")
+        print("Swapping tables")  # noqa: T201
+        swap_tables(cursor, epc_table, staging_table, old_table, index_names)
+        cursor.execute(f"DROP TABLE {old_table}")
+    duration = time.monotonic() - started_at
+    print(f"Finished full refresh of {total} rows in {duration:.1f}s")  # noqa: T201
+    return total
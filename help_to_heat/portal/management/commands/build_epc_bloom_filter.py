@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from help_to_heat.portal import epc_bloom
+
+
+class Command(BaseCommand):
+    help = "Build a bloom filter of every UPRN with an EPC rating, so lookups can skip UPRNs without one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-p", "--path", type=str, default=settings.EPC_BLOOM_FILTER_PATH, help="Where to write it")
+        parser.add_argument(
+            "--false-positive-rate",
+            type=float,
+            default=settings.EPC_BLOOM_FALSE_POSITIVE_RATE,
+            help="The chance of a UPRN without a rating passing the filter",
+        )
+
+    def handle(self, *args, **kwargs):
+        epc_bloom.build_bloom_filter(kwargs["path"], kwargs["false_positive_rate"])
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from help_to_heat.portal import epc_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export EPC ratings to a memory mapped snapshot file for lookups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-p", "--path", type=str, default=settings.EPC_SNAPSHOT_PATH, help="Where to write it")
+
+    def handle(self, *args, **kwargs):
+        epc_snapshot.build_snapshot(kwargs["path"])
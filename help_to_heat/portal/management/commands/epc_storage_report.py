@@ -0,0 +1,23 @@
+import json
+import pathlib
+
+from django.core.management.base import BaseCommand
+
+from help_to_heat.portal import epc_storage
+
+
+class Command(BaseCommand):
+    help = "Report the size of the EPC table and how long rating lookups take"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=epc_storage.LOOKUP_SAMPLES, help="How many lookups to time")
+        parser.add_argument("--output", type=pathlib.Path, help="Save the report as JSON, to compare against later")
+        parser.add_argument("--compare", type=pathlib.Path, help="A saved report to show changes against")
+
+    def handle(self, *args, **kwargs):
+        report = epc_storage.measure(kwargs["samples"])
+        before = json.loads(kwargs["compare"].read_text()) if kwargs["compare"] else None
+        for line in epc_storage.format_report(report, before):
+            print(line)  # noqa: T201
+        if kwargs["output"]:
+            kwargs["output"].write_text(json.dumps(report, indent=2))
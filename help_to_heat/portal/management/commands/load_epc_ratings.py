@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from help_to_heat.portal import epc_writer
+from help_to_heat.portal import epc_pipeline, epc_writer
 
 
 class Command(BaseCommand):
@@ -8,9 +8,36 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("-u", "--url", type=str, help="The url to download")
+        parser.add_argument(
+            "--sort-buffer-mb",
+            type=int,
+            default=epc_writer.SORT_BUFFER_SIZE // (1024 * 1024),
+            help="How much memory to use for each sorted run before spilling to disk",
+        )
+        parser.add_argument("--bulk", action="store_true", help="Load with COPY in batches rather than row by row")
+        parser.add_argument(
+            "--full-refresh",
+            action="store_true",
+            help="Replace every rating by loading into a staging table and swapping it in",
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Stream the download straight into the database, with every stage running concurrently",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=epc_writer.BATCH_SIZE, help="How many rows to load per bulk batch"
+        )
 
     def handle(self, *args, **kwargs):
-        url = kwargs["url"]
-        sorted_filepath = epc_writer.save_url_in_chunks(url)
-        rows = epc_writer.read_rows(sorted_filepath)
-        epc_writer.write_rows(rows)
+        if kwargs["pipeline"]:
+            epc_pipeline.write_url_pipelined(kwargs["url"], batch_size=kwargs["batch_size"])
+        else:
+            epc_writer.import_epc_ratings(
+                kwargs["url"],
+                bulk=kwargs["bulk"],
+                full_refresh=kwargs["full_refresh"],
+                batch_size=kwargs["batch_size"],
+                sort_buffer_size=kwargs["sort_buffer_mb"] * 1024 * 1024,
+            )
+        epc_writer.build_lookup_files()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from help_to_heat.portal import epc_jobs
+
+
+class Command(BaseCommand):
+    help = "Claim and run queued EPC import jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once there are no more queued jobs")
+        parser.add_argument(
+            "--poll-interval", type=int, default=epc_jobs.POLL_INTERVAL, help="Seconds to wait between checks for jobs"
+        )
+
+    def handle(self, *args, **kwargs):
+        epc_jobs.run_worker(once=kwargs["once"], poll_interval=kwargs["poll_interval"])
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:14
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("portal", "0011_data_migrate_roles_again"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EpcImportJob",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("url", models.CharField(max_length=1024)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("RUNNING", "Running"),
+                            ("COMPLETE", "Complete"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "phase",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("DOWNLOAD", "Download"),
+                            ("DECOMPRESS", "Decompress"),
+                            ("SORT", "Sort"),
+                            ("LOAD", "Load"),
+                        ],
+                        max_length=32,
+                        null=True,
+                    ),
+                ),
+                ("bytes_processed", models.BigIntegerField(default=0)),
+                ("rows_processed", models.BigIntegerField(default=0)),
+                ("rate", models.FloatField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="epcimportjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "PENDING")), fields=("status",), name="one pending epc import job"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("portal", "0012_epcimportjob"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                "UPDATE portal_epcrating SET rating = upper(trim(rating)) WHERE rating <> upper(trim(rating))",
+                "DELETE FROM portal_epcrating WHERE uprn !~ '^[0-9]{1,18}$' OR rating !~ '^[A-H]$'",
+            ]
+        ),
+        migrations.AlterModelOptions(
+            name="epcrating",
+            options={},
+        ),
+        migrations.RemoveField(
+            model_name="epcrating",
+            name="created_at",
+        ),
+        migrations.AlterField(
+            model_name="epcrating",
+            name="modified_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="epcrating",
+            name="rating",
+            field=models.CharField(
+                choices=[
+                    ("A", "A"),
+                    ("B", "B"),
+                    ("C", "C"),
+                    ("D", "D"),
+                    ("E", "E"),
+                    ("F", "F"),
+                    ("G", "G"),
+                    ("H", "H"),
+                ],
+                max_length=1,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="epcrating",
+            name="uprn",
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
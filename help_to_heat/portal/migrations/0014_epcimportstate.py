@@ -0,0 +1,34 @@
+# Generated by Django 3.2.19 on 2026-10-18 12:27
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("portal", "0013_compact_epcrating"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EpcImportState",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("url", models.CharField(max_length=1024)),
+                ("checksum", models.CharField(max_length=64)),
+                ("last_date", models.DateField(blank=True, null=True)),
+                ("rows_loaded", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AlterField(
+            model_name="epcrating",
+            name="date",
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
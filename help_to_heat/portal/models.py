@@ -5,6 +5,7 @@ import pyotp
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django_use_email_as_username.models import BaseUser, BaseUserManager
 
 from help_to_heat import utils
@@ -132,10 +133,78 @@ class Referral(utils.UUIDPrimaryKeyBase, utils.TimeStampedModel):
         return f"<referral id={self.id} supplier={self.supplier}>"
 
 
-class EpcRating(utils.TimeStampedModel):
-    uprn = models.CharField(max_length=12, primary_key=True)
-    rating = models.CharField(max_length=32, choices=epc_rating_choices)
-    date = models.DateField(blank=True, null=True)
+class EpcRating(models.Model):
+    uprn = models.BigIntegerField(primary_key=True)
+    rating = models.CharField(max_length=1, choices=epc_rating_choices)
+    date = models.DateField(blank=True, null=True, db_index=True)
+    modified_at = models.DateTimeField(editable=False, blank=True, null=True)
 
     def __str__(self):
         return f"<EpcRating uprn={self.uprn}>"
+
+    def save(self, *args, **kwargs):
+        if settings.EPC_AUDIT_TIMESTAMPS:
+            self.modified_at = timezone.now()
+        return super().save(*args, **kwargs)
+
+
+class EpcImportStatus(utils.Choices):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETE = "Complete"
+    FAILED = "Failed"
+
+
+class EpcImportPhase(utils.Choices):
+    DOWNLOAD = "Download"
+    DECOMPRESS = "Decompress"
+    SORT = "Sort"
+    LOAD = "Load"
+
+
+class EpcImportJob(utils.UUIDPrimaryKeyBase, utils.TimeStampedModel):
+    url = models.CharField(max_length=1024)
+    status = models.CharField(max_length=32, choices=EpcImportStatus.choices, default="PENDING")
+    phase = models.CharField(max_length=32, choices=EpcImportPhase.choices, blank=True, null=True)
+    bytes_processed = models.BigIntegerField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+    rate = models.FloatField(default=0)
+    error = models.TextField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status"], condition=models.Q(status="PENDING"), name="one pending epc import job"
+            ),
+        ]
+
+    def __str__(self):
+        return f"<EpcImportJob id={self.id} status={self.status}>"
+
+    @property
+    def is_active(self):
+        return self.status in ("PENDING", "RUNNING")
+
+    def update_progress(self, **fields):
+        fields = {**fields, "modified_at": timezone.now()}
+        EpcImportJob.objects.filter(pk=self.pk).update(**fields)
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+
+class EpcImportState(utils.UUIDPrimaryKeyBase, utils.TimeStampedModel):
+    """The watermark left by each completed EPC load, so the next one can pick up where it stopped"""
+
+    url = models.CharField(max_length=1024)
+    checksum = models.CharField(max_length=64)
+    last_date = models.DateField(blank=True, null=True)
+    rows_loaded = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"<EpcImportState last_date={self.last_date}>"
@@ -69,6 +69,7 @@ portal_patterns = [
     path("data-download/", download_views.download_csv_view, name="data-download"),
     path("data-download/<uuid:download_id>/", download_views.download_csv_by_id_view, name="download-csv-by-id"),
     path("epc-upload/", views.EPCUploadView, name="epc-upload"),
+    path("epc-upload/status/", views.epc_upload_status_view, name="epc-upload-status"),
     path("accounts/password-reset/", authentication_views.PasswordReset, name="password-reset"),
     path("accounts/change-password/reset/", authentication_views.PasswordChange, name="password-reset-change"),
     path("accounts/password-reset-done/", authentication_views.password_reset_done, name="password-reset-done"),
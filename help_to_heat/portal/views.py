@@ -8,7 +8,7 @@ from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 
 from .. import utils
-from . import decorators, models
+from . import decorators, epc_jobs, models
 
 
 @require_http_methods(["GET"])
@@ -101,26 +101,55 @@ def healthcheck_view(request):
 
 
 @require_http_methods(["GET", "POST"])
+@decorators.requires_service_manager
 class EPCUploadView(utils.MethodDispatcher):
     args = (
         "/usr/local/bin/python",
         "/app/manage.py",
-        "load_epc_ratings",
-        "--url",
+        "run_epc_import_worker",
+        "--once",
     )
 
     def get(self, request):
         epc_count = models.EpcRating.objects.count()
+        active_job = epc_jobs.get_active_job()
+        jobs = models.EpcImportJob.objects.all()[:5]
         template = "portal/epc-upload.html"
         return render(
             request,
             template_name=template,
-            context={"epc_count": epc_count},
+            context={"epc_count": epc_count, "active_job": active_job, "jobs": jobs},
         )
 
     def post(self, request):
         url = request.POST["url"]
-        cmd_args = self.args + (url,)
-        subprocess.Popen(cmd_args)
+        try:
+            epc_jobs.create_job(url)
+        except epc_jobs.ImportAlreadyActive:
+            messages.error(request, "An upload is already in progress")
+            return redirect("portal:epc-upload")
+        subprocess.Popen(self.args)
         messages.info(request, "Upload started")
         return redirect("portal:epc-upload")
+
+
+@require_http_methods(["GET"])
+@decorators.requires_service_manager
+def epc_upload_status_view(request):
+    job = models.EpcImportJob.objects.first()
+    if not job:
+        return JsonResponse({"job": None})
+    data = {
+        "id": job.id,
+        "url": job.url,
+        "status": job.status,
+        "phase": job.phase,
+        "bytes_processed": job.bytes_processed,
+        "rows_processed": job.rows_processed,
+        "rate": job.rate,
+        "error": job.error,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "updated_at": job.modified_at,
+    }
+    return JsonResponse({"job": data})
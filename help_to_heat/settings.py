@@ -59,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "help_to_heat.frontdoor.session_cache.session_cache_middleware",
 ]
 
 if BASIC_AUTH:
@@ -169,6 +170,42 @@ SHOW_FRONTDOOR = True
 
 OS_API_KEY = env.str("OS_API_KEY")
 
+EPC_AUDIT_TIMESTAMPS = env.bool("EPC_AUDIT_TIMESTAMPS", default=False)
+EPC_SNAPSHOT_PATH = env.str("EPC_SNAPSHOT_PATH", default=None)
+EPC_BLOOM_FILTER_PATH = env.str("EPC_BLOOM_FILTER_PATH", default=None)
+EPC_BLOOM_FALSE_POSITIVE_RATE = env.float("EPC_BLOOM_FALSE_POSITIVE_RATE", default=0.01)
+
+ANSWER_STORAGE_MODE = env.str("ANSWER_STORAGE_MODE", default="APPEND")
+if ANSWER_STORAGE_MODE not in ("APPEND", "UPSERT"):
+    raise Exception(f"Unknown ANSWER_STORAGE_MODE of {ANSWER_STORAGE_MODE}")
+ANSWER_HISTORY = env.bool("ANSWER_HISTORY", default=False)
+ANSWER_FOLD_MODE = env.str("ANSWER_FOLD_MODE", default="PYTHON")
+if ANSWER_FOLD_MODE not in ("PYTHON", "DATABASE"):
+    raise Exception(f"Unknown ANSWER_FOLD_MODE of {ANSWER_FOLD_MODE}")
+SESSION_TTL_DAYS = env.int("SESSION_TTL_DAYS", default=90)
+
+EVENT_WRITE_MODE = env.str("EVENT_WRITE_MODE", default="SYNC")
+if EVENT_WRITE_MODE not in ("BUFFERED", "SYNC"):
+    raise Exception(f"Unknown EVENT_WRITE_MODE of {EVENT_WRITE_MODE}")
+EVENT_BUFFER_SIZE = env.int("EVENT_BUFFER_SIZE", default=100)
+EVENT_BUFFER_MAX_AGE = env.float("EVENT_BUFFER_MAX_AGE", default=1.0)
+EVENT_RETENTION_MONTHS = env.int("EVENT_RETENTION_MONTHS", default=24)
+OS_API_POOL_SIZE = env.int("OS_API_POOL_SIZE", default=8)
+OS_API_MAX_CONCURRENCY = env.int("OS_API_MAX_CONCURRENCY", default=8)
+OS_API_CONNECT_TIMEOUT = env.float("OS_API_CONNECT_TIMEOUT", default=3.05)
+OS_API_READ_TIMEOUT = env.float("OS_API_READ_TIMEOUT", default=10.0)
+OS_API_RETRIES = env.int("OS_API_RETRIES", default=2)
+OS_API_BACKOFF = env.float("OS_API_BACKOFF", default=0.2)
+ADDRESS_BREAKER_WINDOW = env.int("ADDRESS_BREAKER_WINDOW", default=60)
+ADDRESS_BREAKER_MIN_CALLS = env.int("ADDRESS_BREAKER_MIN_CALLS", default=5)
+ADDRESS_BREAKER_FAILURE_RATE = env.float("ADDRESS_BREAKER_FAILURE_RATE", default=0.5)
+ADDRESS_BREAKER_SLOW_CALL = env.float("ADDRESS_BREAKER_SLOW_CALL", default=5.0)
+ADDRESS_BREAKER_RESET_TIMEOUT = env.int("ADDRESS_BREAKER_RESET_TIMEOUT", default=30)
+ADDRESS_INDEX_PATH = env.str("ADDRESS_INDEX_PATH", default=None)
+ADDRESS_CACHE_SIZE = env.int("ADDRESS_CACHE_SIZE", default=1000)
+ADDRESS_CACHE_TTL = env.int("ADDRESS_CACHE_TTL", default=24 * 60 * 60)
+ADDRESS_CACHE_DATABASE = env.bool("ADDRESS_CACHE_DATABASE", default=False)
+
 TOTP_ISSUER = "Help to Heat Supplier Portal"
 
 if not DEBUG:
@@ -1,17 +1,24 @@
+import atexit
 import base64
 import enum
 import functools
 import hashlib
 import inspect
+import logging
+import os
 import secrets
+import threading
+import time
 import types
 import uuid
 
 import marshmallow
 from django.conf import settings
-from django.db import models
+from django.db import close_old_connections, connection, models, transaction
 from django.http import HttpResponseNotAllowed
 
+logger = logging.getLogger(__name__)
+
 event_names = set()
 
 
@@ -115,20 +122,116 @@ class DuplicateEvent(Exception):
     pass
 
 
+def get_binder(func):
+    """Make a function that calculates what the args would be inside `func`,
+    working out its signature once rather than on every call"""
+    sig = inspect.signature(func)
+
+    def bind(*args, **kwargs):
+        bound_args = sig.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        return bound_args.arguments
+
+    return bind
+
+
 def get_arguments(func, *args, **kwargs):
     """Calculate what the args would be inside a function"""
-    sig = inspect.signature(func)
-    bound_args = sig.bind(*args, **kwargs)
-    bound_args.apply_defaults()
-    arguments = bound_args.arguments
-    return arguments
+    return get_binder(func)(*args, **kwargs)
+
+
+class EventBuffer:
+    """Collects events in memory and writes them with bulk_create, once `max_size` are waiting
+    or the oldest has waited `max_age` seconds, and when the process exits"""
+
+    def __init__(self, max_size=100, max_age=1.0):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.events = []
+        self.oldest_at = None
+        self.flusher = None
+        self.buffered = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def add(self, event):
+        with self.lock:
+            if not self.events:
+                self.oldest_at = time.monotonic()
+            self.events.append(event)
+            self.buffered += 1
+            is_full = len(self.events) >= self.max_size
+            if not self.flusher:
+                self.flusher = threading.Thread(target=self.flush_periodically, name="event-buffer", daemon=True)
+                self.flusher.start()
+        if is_full:
+            self.flush()
+
+    def take(self):
+        with self.lock:
+            events, self.events = self.events, []
+            self.oldest_at = None
+        return events
+
+    def flush(self):
+        events = self.take()
+        models_events = {}
+        for event in events:
+            models_events.setdefault(type(event), []).append(event)
+        for EventModel, model_events in models_events.items():  # noqa N806
+            try:
+                self.write(EventModel, model_events)
+            except Exception:  # noqa: B902
+                logger.exception("Dropped %d %s events", len(model_events), EventModel.__name__)
+                with self.lock:
+                    self.dropped += len(model_events)
+            else:
+                with self.lock:
+                    self.flushed += len(model_events)
+        return len(events)
+
+    def write(self, EventModel, events):  # noqa N803
+        """bulk_create the events, trying once more on a fresh connection if the current one has failed,
+        such as after a database restart or idle timeout"""
+        try:
+            EventModel.objects.bulk_create(events)
+        except Exception:  # noqa: B902
+            if connection.in_atomic_block:
+                raise
+            logger.warning("Retrying %d %s events on a new connection", len(events), EventModel.__name__)
+            connection.close()
+            EventModel.objects.bulk_create(events)
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(self.max_age)
+            if self.oldest_at and time.monotonic() - self.oldest_at >= self.max_age:
+                close_old_connections()
+                self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "buffered": self.buffered,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "waiting": len(self.events),
+            }
+
+
+event_buffer = EventBuffer(max_size=settings.EVENT_BUFFER_SIZE, max_age=settings.EVENT_BUFFER_MAX_AGE)
+atexit.register(event_buffer.flush)
 
 
 def _register_event(EventModel, event_name, arguments):  # noqa N803
     event_names.add(event_name)
     arguments = {key: value for (key, value) in arguments.items() if key != "self"}
     event = EventModel(name=event_name, data=arguments)
-    event.save()
+    if settings.EVENT_WRITE_MODE == "BUFFERED":
+        transaction.on_commit(lambda: event_buffer.add(event))
+    else:
+        event.save()
 
 
 def resolve_schema(schema):
@@ -142,9 +245,11 @@ def register_event(EventModel, event_name):  # noqa N803
     def _decorator(func):
         func.event_name = event_name
 
+        bind = get_binder(func)
+
         @functools.wraps(func)
         def _inner(*args, **kwargs):
-            arguments = get_arguments(func, *args, **kwargs)
+            arguments = bind(*args, **kwargs)
             _register_event(EventModel, event_name, arguments)
             return func(*args, **kwargs)
 
@@ -153,24 +258,13 @@ def register_event(EventModel, event_name):  # noqa N803
     return _decorator
 
 
-def process_self(func, arguments):
-    """Remove `self` from arguments and bind it to func"""
-    if "self" in arguments:
-        func = functools.partial(func, arguments["self"])
-        arguments = {k: v for k, v in arguments.items() if k != "self"}
-    return func, arguments
-
-
-def apply_schema(schema, data, load_or_dump):
-    """Apply a schema to some data"""
-    if not schema:
-        return data
+def get_schema_method(schema, load_or_dump):
+    """The schema's load or dump method, or None if there's no schema"""
     if load_or_dump not in ("load", "dump"):
         raise ValueError(f"Unknown value {load_or_dump}")
-    if schema:
-        schema = resolve_schema(schema)
-        arguments = getattr(schema, load_or_dump)(data)
-    return arguments
+    if not schema:
+        return None
+    return getattr(resolve_schema(schema), load_or_dump)
 
 
 def with_schema(default=None, load=None, dump=None):
@@ -179,17 +273,24 @@ def with_schema(default=None, load=None, dump=None):
 
     This ensures that validation has been passed and that the result of the
     function is JSON serialisable"""
-    load_schema = load or default
-    dump_schema = dump or default
+    load_arguments = get_schema_method(load or default, "load")
+    dump_result = get_schema_method(dump or default, "dump")
 
     def _decorator(func):
+        bind = get_binder(func)
+
         @functools.wraps(func)
         def _inner(*args, **kwargs):
-            arguments = get_arguments(func, *args, **kwargs)
-            bound_func, arguments = process_self(func, arguments)
-            arguments = apply_schema(load_schema, arguments, "load")
-            result = bound_func(**arguments)
-            result = apply_schema(dump_schema, result, "dump")
+            arguments = bind(*args, **kwargs)
+            self = arguments.pop("self", None)
+            if load_arguments:
+                arguments = load_arguments(arguments)
+            if self is None:
+                result = func(**arguments)
+            else:
+                result = func(self, **arguments)
+            if dump_result:
+                result = dump_result(result)
             return result
 
         return _inner
@@ -217,6 +318,52 @@ class Entity:
         self.event_names = tuple(item for item in possible_event_names if item)
 
 
+class FileCache:
+    """Holds an object loaded from a file, reloading it if the file has been replaced.
+
+    The file is checked at most once every `check_interval` seconds."""
+
+    def __init__(self, loader, check_interval=30):
+        self.loader = loader
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.path = None
+        self.stat = None
+        self.value = None
+        self.checked_at = None
+
+    def get_stat(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, path):
+        if not path:
+            return None
+        path = str(path)
+        if path == self.path and time.monotonic() - self.checked_at < self.check_interval:
+            return self.value
+        with self.lock:
+            stat = self.get_stat(path)
+            if path != self.path or stat != self.stat:
+                self.value = self.loader(path) if stat else None
+                self.path = path
+                self.stat = stat
+            self.checked_at = time.monotonic()
+            return self.value
+
+
+def percentile(values, fraction):
+    """The value at `fraction` (0 to 1) through `values`, using the nearest rank"""
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
 def make_totp_key():
     return secrets.token_hex(32)
 
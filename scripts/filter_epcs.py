@@ -1,7 +1,10 @@
 # Download the data from here: https://epc.opendatacommunities.org/domestic/search
 
+import argparse
 import bz2
 import csv
+import multiprocessing
+import os
 import pathlib
 
 __here__ = pathlib.Path(__file__).parent
@@ -10,37 +13,59 @@ OUTPUT_FILEPATH = OUTPUT_DIR / "epc_ratings_unique.csv.bz2"
 DATA_DIR = __here__.parent / "all-domestic-certificates"
 
 
-def collect_data():
-    for filepath in DATA_DIR.glob("**/certificates.csv"):
-        print(f"Processing: {filepath}")  # noqa
-        with filepath.open() as f:
-            reader = csv.DictReader(f)
-            rows = reversed(sorted(reader, key=lambda row: row["LODGEMENT_DATE"]))
-        seen_uprns = set()
-        for row in rows:
-            if row["UPRN"]:
-                if row["UPRN"] not in seen_uprns:
-                    seen_uprns.add(row["UPRN"])
-                    yield {
-                        "uprn": row["UPRN"],
-                        "epc_rating": row["CURRENT_ENERGY_RATING"],
-                        "date": row["LODGEMENT_DATE"],
-                    }
-
-
-def save_data(data):
+def collect_file(filepath):
+    """Keep only the latest certificate for each UPRN, streaming through the file"""
+    print(f"Processing: {filepath}")  # noqa
+    latest = {}
+    with filepath.open() as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            uprn = row["UPRN"]
+            if not uprn:
+                continue
+            date = row["LODGEMENT_DATE"]
+            current = latest.get(uprn)
+            if current is None or date >= current[0]:
+                latest[uprn] = (date, row["CURRENT_ENERGY_RATING"])
+    return latest
+
+
+def merge_latest(latest, other):
+    for uprn, (date, rating) in other.items():
+        current = latest.get(uprn)
+        if current is None or date >= current[0]:
+            latest[uprn] = (date, rating)
+    return latest
+
+
+def collect_data(data_dir=DATA_DIR, processes=None):
+    filepaths = sorted(data_dir.glob("**/certificates.csv"))
+    latest = {}
+    with multiprocessing.Pool(processes) as pool:
+        for file_latest in pool.imap(collect_file, filepaths):
+            merge_latest(latest, file_latest)
+    return latest
+
+
+def save_data(latest, output_filepath=OUTPUT_FILEPATH):
     print("Sorting output")  # noqa
-    rows = sorted(data, key=lambda row: row["date"])
-    print(f"Writing to {OUTPUT_FILEPATH}")  # noqa
-    with bz2.open(OUTPUT_FILEPATH, "wt", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=("date", "uprn", "epc_rating"))
-        writer.writeheader()
-        for item in rows:
-            writer.writerow(item)
+    rows = sorted(latest.items(), key=lambda item: item[1][0])
+    print(f"Writing to {output_filepath}")  # noqa
+    output_filepath.parent.mkdir(parents=True, exist_ok=True)
+    with bz2.open(output_filepath, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("date", "uprn", "epc_rating"))
+        for uprn, (date, rating) in rows:
+            writer.writerow((date, uprn, rating))
 
 
 def main():
-    save_data(collect_data())
+    parser = argparse.ArgumentParser(description="Keep the latest EPC rating for each UPRN")
+    parser.add_argument("--data-dir", type=pathlib.Path, default=DATA_DIR)
+    parser.add_argument("--output", type=pathlib.Path, default=OUTPUT_FILEPATH)
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="How many files to process at once")
+    args = parser.parse_args()
+    save_data(collect_data(args.data_dir, args.processes), args.output)
 
 
 if __name__ == "__main__":
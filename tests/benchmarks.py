@@ -0,0 +1,117 @@
+"""Micro-benchmarks for the interface layer, run with `python -m tests.benchmarks`"""
+
+import functools
+import inspect
+import timeit
+import uuid
+
+from help_to_heat import utils
+from help_to_heat.frontdoor import interface, schemas
+
+NUMBER = 2000
+
+
+def uncached_with_schema(load=None, dump=None):
+    """with_schema as it was, working out the signature and making schema instances on every call"""
+
+    def _decorator(func):
+        @functools.wraps(func)
+        def _inner(*args, **kwargs):
+            bound_args = inspect.signature(func).bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            arguments = dict(bound_args.arguments)
+            self = arguments.pop("self")
+            arguments = load().load(arguments)
+            return dump().dump(func(self, **arguments))
+
+        return _inner
+
+    return _decorator
+
+
+class Example:
+    def get_answer(self, session_id, page_name):
+        return {"country": "England", "own_property": "Yes, I own my property and live in it"}
+
+
+class Uncached(Example):
+    get_answer = uncached_with_schema(load=interface.GetAnswerSchema, dump=schemas.SessionSchema)(Example.get_answer)
+
+
+class Cached(Example):
+    get_answer = utils.with_schema(load=interface.GetAnswerSchema, dump=schemas.SessionSchema)(Example.get_answer)
+
+
+def time_per_call(func, number=NUMBER):
+    """Microseconds per call of `func`"""
+    return timeit.timeit(func, number=number) / number * 1_000_000
+
+
+def benchmark_with_schema():
+    session_id = uuid.uuid4()
+    undecorated, uncached, cached = Example(), Uncached(), Cached()
+    return {
+        "undecorated": time_per_call(lambda: undecorated.get_answer(session_id, "country")),
+        "with_schema before": time_per_call(lambda: uncached.get_answer(session_id, "country")),
+        "with_schema after": time_per_call(lambda: cached.get_answer(session_id, "country")),
+    }
+
+
+def benchmark_get_arguments():
+    return {
+        "signature per call": time_per_call(lambda: utils.get_arguments(Example.get_answer, None, "a", "b")),
+        "precomputed signature": time_per_call(functools.partial(utils.get_binder(Example.get_answer), None, "a", "b")),
+    }
+
+
+SESSION = {
+    "country": "England",
+    "own_property": "Yes, I own my property and live in it",
+    "address_line_1": "10 Downing Street",
+    "town_or_city": "London",
+    "postcode": "SW1A 2AA",
+    "uprn": 100023336956,
+    "epc_rating": "D",
+    "benefits": "Yes",
+    "property_type": "House",
+    "number_of_bedrooms": "Two bedrooms",
+    "first_name": "Freddy",
+    "last_name": "Flibble",
+    "email": "freddy@example.com",
+    "schemes": ["ECO4"],
+}
+
+
+def benchmark_session_schema():
+    schema, compiled_schema = schemas.SessionSchema(), schemas.CompiledSessionSchema()
+    return {
+        "SessionSchema.load": time_per_call(lambda: schema.load(SESSION)),
+        "CompiledSessionSchema.load": time_per_call(lambda: compiled_schema.load(SESSION)),
+        "SessionSchema.dump": time_per_call(lambda: schema.dump(SESSION)),
+        "CompiledSessionSchema.dump": time_per_call(lambda: compiled_schema.dump(SESSION)),
+    }
+
+
+def benchmark_interface():
+    session_id = uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    return {
+        "interface.api.session.get_answer": time_per_call(
+            lambda: interface.api.session.get_answer(session_id, "country"), number=200
+        ),
+    }
+
+
+BENCHMARKS = (benchmark_get_arguments, benchmark_with_schema, benchmark_session_schema, benchmark_interface)
+
+
+def main():
+    assert Cached().get_answer(uuid.uuid4(), "country") == Uncached().get_answer(uuid.uuid4(), "country")
+    for benchmark in BENCHMARKS:
+        print(benchmark.__name__)  # noqa: T201
+        for label, microseconds in benchmark().items():
+            print(f"  {label}: {microseconds:.1f}µs per call")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import csv
+import pathlib
+import tempfile
+import unittest.mock
+
+from django.test import override_settings
+
+from help_to_heat.frontdoor import address_index, interface
+
+from . import utils
+
+SOURCES = (
+    utils.DATA_DIR / "sample_os_api_find_response.json",
+    utils.DATA_DIR / "sample_osdatahub_uprn_response.json",
+)
+
+
+class UnusedAPI(utils.StubAPI):
+    def find(self, text, dataset=None, limit=None):
+        raise AssertionError("The index should have answered this")
+
+    def uprn(self, uprn, dataset=None):
+        raise AssertionError("The index should have answered this")
+
+
+def test_address_index():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = pathlib.Path(temp_dir) / "addresses.idx"
+        count = address_index.build_index(path, SOURCES)
+        index = address_index.AddressIndex(path)
+        assert len(index) == count
+
+        results = index.find("('10 Downing Street', 'sw1a 2aa')")
+        assert results[0] == {
+            "uprn": "100023336956",
+            "address": "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA",
+        }, results
+        results = index.find("11 Downing Street, SW1A2AB")
+        assert [result["uprn"] for result in results] == ["10033533595", "10015453640"], results
+        assert index.find("10 Downing Street, PO99 9PO") is None
+        assert index.find("10 Downing Street") is None
+
+        assert index.get(100023336956)["address"] == "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA"
+        assert index.get(1) is None
+
+
+def test_address_index_from_csv():
+    rows = [
+        {
+            "UPRN": str(uprn),
+            "ADDRESS": f"{uprn}, HIGH STREET, TOWN, AB{uprn % 5} 1CD",
+            "POSTCODE_LOCATOR": f"AB{uprn % 5} 1CD",
+        }
+        for uprn in range(1000, 1, -1)
+    ]
+    rows.append({"UPRN": "500", "ADDRESS": "A LATER ADDRESS", "POSTCODE_LOCATOR": "AB0 1CD"})
+    rows.append({"UPRN": "", "ADDRESS": "NO UPRN", "POSTCODE_LOCATOR": "AB0 1CD"})
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = pathlib.Path(temp_dir) / "addressbase.csv"
+        with source.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["UPRN", "ADDRESS", "POSTCODE_LOCATOR"])
+            writer.writeheader()
+            writer.writerows(rows)
+        path = pathlib.Path(temp_dir) / "addresses.idx"
+        count = address_index.build_index(path, [source], buffer_size=4096)
+        index = address_index.AddressIndex(path)
+        assert count == len(index) == 999
+        assert index.postcode_count == 5
+
+        assert index.get(500) == {"uprn": "500", "address": "500, HIGH STREET, TOWN, AB0 1CD"}
+        assert index.get(2)["address"] == "2, HIGH STREET, TOWN, AB2 1CD"
+        assert index.get(1) is None
+        results = index.find("123 High Street, AB3 1CD")
+        assert results[0] == {"uprn": "123", "address": "123, HIGH STREET, TOWN, AB3 1CD"}, results
+        assert len(index.get_postcode("ab4 1cd")) == 200
+
+
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", UnusedAPI)
+def test_address_index_backend():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = pathlib.Path(temp_dir) / "addresses.idx"
+        address_index.build_index(path, SOURCES)
+        with override_settings(ADDRESS_INDEX_PATH=str(path)):
+            results = interface.api.address.find_addresses("('10 Downing Street', 'SW1A 2AA')")
+            assert results[0]["uprn"] == "100023336956", results
+            result = interface.api.address.get_address(uprn=100023336956)
+            assert result["address"] == "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA", result
+
+            with unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI):
+                results = interface.api.address.find_addresses("999 Letsby Avenue, PO99 9PO")
+                assert len(results) == 10, results
+                result = interface.api.address.get_address(uprn=1)
+                assert result["address"] == "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA", result
@@ -20,8 +20,7 @@ def test_epc_duplicates():
     epc1 = models.EpcRating(**data)
     epc1.save()
     with assert_raises(django.db.utils.IntegrityError):
-        epc2 = models.EpcRating(**data)
-        epc2.save()
+        models.EpcRating.objects.create(**data)
 
 
 @utils.with_client
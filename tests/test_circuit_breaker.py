@@ -0,0 +1,116 @@
+import unittest.mock
+import uuid
+
+import requests
+from nose.tools import assert_raises
+
+from help_to_heat.frontdoor import circuit_breaker, interface, os_places
+
+from . import utils
+
+
+class FailingAPI(utils.StubAPI):
+    def find(self, text, dataset=None, limit=None):
+        raise requests.ConnectTimeout()
+
+
+def fail():
+    raise requests.ConnectionError()
+
+
+def succeed():
+    return "ok"
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def test_circuit_breaker():
+    breaker = circuit_breaker.CircuitBreaker(
+        "Test", is_failure=os_places.is_unavailable, min_calls=4, failure_rate=0.5, reset_timeout=0
+    )
+    assert breaker.call(succeed) == "ok"
+    with assert_raises(KeyError):
+        breaker.call({}.__getitem__, "not-a-failure")
+    with assert_raises(requests.ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == circuit_breaker.CLOSED
+    with assert_raises(requests.ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == circuit_breaker.OPEN
+
+    breaker.reset_timeout = 60
+    with assert_raises(circuit_breaker.CircuitOpen):
+        breaker.call(succeed)
+    breaker.reset_timeout = 0
+
+    with assert_raises(requests.ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.call(succeed) == "ok"
+    assert breaker.state == circuit_breaker.CLOSED
+
+    stats = breaker.stats()
+    assert (stats["rejected"], stats["probes"]) == (1, 2), stats
+    assert stats["transitions"] == {
+        "closed -> open": 1,
+        "open -> half-open": 2,
+        "half-open -> open": 1,
+        "half-open -> closed": 1,
+    }
+
+
+def bad_request():
+    raise http_error(400)
+
+
+def test_bad_requests_dont_open_the_circuit():
+    breaker = circuit_breaker.CircuitBreaker("Test", is_failure=os_places.is_unavailable, min_calls=1)
+    for _ in range(3):
+        with assert_raises(requests.HTTPError):
+            breaker.call(bad_request)
+    assert breaker.state == circuit_breaker.CLOSED
+
+    assert os_places.is_unavailable(http_error(429))
+    assert os_places.is_unavailable(http_error(503))
+    assert os_places.is_unavailable(requests.ReadTimeout())
+    assert not os_places.is_unavailable(http_error(404))
+
+
+def test_slow_calls_open_the_circuit():
+    breaker = circuit_breaker.CircuitBreaker("Test", slow_call=0, min_calls=1)
+    assert breaker.call(succeed) == "ok"
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def _start_address_select(session_id):
+    interface.api.session.save_answer(
+        session_id=session_id, page_name="address", data={"address_line_1": "999 Letsby Avenue", "postcode": "PO99 9PO"}
+    )
+
+
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", FailingAPI)
+def test_address_select_falls_back_to_manual_address():
+    breaker = circuit_breaker.address_breaker
+    breaker.reset()
+    session_id = uuid.uuid4()
+    _start_address_select(session_id)
+    client = utils.get_client()
+    try:
+        page = client.get(f"/{session_id}/address-select/")
+        assert page.status_code == 302, page.status_code
+        assert page.headers["Location"] == f"/{session_id}/address-manual/", page.headers
+
+        with unittest.mock.patch.object(breaker, "min_calls", 1):
+            with assert_raises(requests.ConnectTimeout):
+                interface.api.address.find_addresses("999 Letsby Avenue, PO99 9PO")
+        assert breaker.state == circuit_breaker.OPEN
+
+        page = client.get(f"/{session_id}/address-select/")
+        assert page.headers["Location"] == f"/{session_id}/address-manual/", page.headers
+        assert breaker.stats()["rejected"] >= 1
+    finally:
+        breaker.reset()
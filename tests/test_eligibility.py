@@ -295,7 +295,7 @@ def test_ineligible_shortcut():
                 _do_test(country=country, council_tax_band=council_tax_band, epc_rating=epc_rating)
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def _do_test(country, council_tax_band, epc_rating):
     _add_epc(uprn="100023336956", rating=epc_rating)
 
@@ -0,0 +1,297 @@
+import bz2
+import datetime
+import pathlib
+import random
+import string
+import tempfile
+import time
+import unittest.mock
+
+import django.db.utils
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+from nose.tools import assert_raises
+
+from help_to_heat.portal import (
+    epc_jobs,
+    epc_pipeline,
+    epc_storage,
+    epc_writer,
+    models,
+)
+
+
+def _make_uprn():
+    return str(int("".join(random.choices(string.digits, k=12))))
+
+
+def test_write_rows_bulk():
+    today = str(datetime.date.today())
+    uprns = tuple(_make_uprn() for _ in range(5))
+    models.EpcRating.objects.create(uprn=uprns[0], rating="G", date=today)
+    rows = tuple({"uprn": uprn, "epc_rating": "C", "date": today} for uprn in uprns)
+    rows = rows + ({"uprn": uprns[1], "epc_rating": "D", "date": "1999-01-01"},)
+
+    total = epc_writer.write_rows_bulk(rows, batch_size=2)
+
+    assert total == 5, total
+    epcs = models.EpcRating.objects.filter(uprn__in=uprns)
+    assert epcs.count() == 5
+    assert set(epc.rating for epc in epcs) == {"C"}
+
+
+def test_write_rows_bulk_skips_invalid_rows():
+    today = str(datetime.date.today())
+    uprn, bad_rating_uprn = _make_uprn(), _make_uprn()
+    rows = (
+        {"uprn": uprn, "epc_rating": "B", "date": today},
+        {"uprn": "not-a-uprn", "epc_rating": "C", "date": today},
+        {"uprn": "1" * 19, "epc_rating": "C", "date": today},
+        {"uprn": bad_rating_uprn, "epc_rating": "INVALID!", "date": today},
+        {"uprn": bad_rating_uprn, "epc_rating": "", "date": today},
+    )
+
+    with override_settings(EPC_AUDIT_TIMESTAMPS=True):
+        assert epc_writer.write_rows_bulk(rows) == 1
+
+    epc = models.EpcRating.objects.get(uprn=uprn)
+    assert epc.rating == "B"
+    assert epc.modified_at
+    assert not models.EpcRating.objects.filter(uprn=bad_rating_uprn).exists()
+    assert epc_writer.write_rows(rows[3:], latest_date=today) == 0
+
+    epc_writer.write_rows_bulk(({"uprn": uprn, "epc_rating": "A", "date": today},))
+    epc = models.EpcRating.objects.get(uprn=uprn)
+    assert epc.rating == "A"
+    assert epc.modified_at is None
+
+
+def test_epc_storage_report():
+    models.EpcRating.objects.create(uprn=_make_uprn(), rating="D", date=datetime.date(2020, 1, 1))
+    report = epc_storage.measure(samples=10)
+    assert report["columns"]["uprn"] == "bigint", report
+    assert report["total_bytes"] > 0
+    assert report["hits"]["lookups"] > 0
+
+    lines = tuple(epc_storage.format_report(report, before={"total_bytes": report["total_bytes"] * 2}))
+    assert f"total_bytes: {report['total_bytes'] * 2} -> {report['total_bytes']} (-50.0%)" in lines, lines
+
+
+def test_batched():
+    batches = tuple(epc_writer.batched(range(5), 2))
+    assert batches == ((0, 1), (2, 3), (4,)), batches
+
+
+def test_sort_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = pathlib.Path(temp_dir)
+        lines = tuple(f"2020-01-{random.randint(1, 28):02},{_make_uprn()},C\n" for _ in range(500))
+        filepath = temp_dir / "epcs.csv"
+        filepath.write_text("date,uprn,epc_rating\n" + "".join(lines))
+        sorted_filepath = temp_dir / "epcs-sorted.csv"
+
+        with unittest.mock.patch.object(epc_writer, "MERGE_FAN_IN", 4):
+            epc_writer.sort_file(filepath, sorted_filepath, buffer_size=1024)
+
+        sorted_lines = sorted_filepath.read_text().splitlines(keepends=True)
+        assert sorted_lines[0] == "date,uprn,epc_rating\n"
+        assert sorted_lines[1:] == sorted(lines)
+        assert set(temp_dir.iterdir()) == {filepath, sorted_filepath}
+
+
+def test_read_rows_from_date():
+    dates = ("",) + tuple(f"2020-{month:02}-{day:02}" for month in range(1, 13) for day in (1, 1, 15))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = pathlib.Path(temp_dir) / "epcs-sorted.csv"
+        lines = sorted(f"{date},{_make_uprn()},C\n" for date in dates)
+        filepath.write_text("date,uprn,epc_rating\n" + "".join(lines))
+
+        assert epc_writer.get_last_date(filepath) == "2020-12-15"
+        for from_date in ("2019-01-01", "2020-01-01", "2020-01-02", "2020-06-15", "2020-12-15", "2021-01-01"):
+            rows = tuple(epc_writer.read_rows(filepath, from_date=from_date))
+            expected = tuple(date for date in sorted(dates) if date >= from_date)
+            assert tuple(row["date"] for row in rows) == expected, (from_date, rows)
+        assert len(tuple(epc_writer.read_rows(filepath))) == len(dates)
+
+
+def test_import_epc_ratings_incremental():
+    models.EpcImportState.objects.all().delete()
+    models.EpcImportState.objects.create(url="https://example.com/old.csv.bz2", checksum="", last_date="2040-01-01")
+    uprns = tuple(_make_uprn() for _ in range(3))
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = pathlib.Path(temp_dir) / "epcs-sorted.csv"
+            lines = (f"2039-12-31,{uprns[0]},C\n", f"2040-01-01,{uprns[1]},D\n", f"2040-02-01,{uprns[2]},E\n")
+            filepath.write_text("date,uprn,epc_rating\n" + "".join(lines))
+
+            with unittest.mock.patch.object(epc_writer, "save_url_in_chunks", lambda url, **kwargs: filepath):
+                total = epc_writer.import_epc_ratings("https://example.com/epcs.csv.bz2", bulk=True)
+                assert total == 2, total
+                state = epc_writer.get_import_state()
+                assert str(state.last_date) == "2040-02-01"
+                assert state.checksum == epc_writer.file_checksum(filepath)
+
+                assert epc_writer.import_epc_ratings("https://example.com/epcs.csv.bz2", bulk=True) == 0
+
+        ratings = dict(models.EpcRating.objects.filter(uprn__in=uprns).values_list("uprn", "rating"))
+        assert ratings == {int(uprns[1]): "D", int(uprns[2]): "E"}, ratings
+    finally:
+        models.EpcImportState.objects.all().delete()
+
+
+def _fake_import(url, bulk, progress):
+    progress("DOWNLOAD", bytes_processed=2048)
+    progress("LOAD", rows_processed=10)
+
+
+def test_epc_import_job():
+    models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING")).update(status="FAILED")
+    job = epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+    assert epc_jobs.get_active_job() == job
+
+    with assert_raises(epc_jobs.ImportAlreadyActive):
+        epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+
+    with unittest.mock.patch.object(epc_writer, "import_epc_ratings", _fake_import):
+        epc_jobs.run_worker(once=True)
+
+    job.refresh_from_db()
+    assert job.status == "COMPLETE", job.status
+    assert job.phase == "LOAD"
+    assert job.bytes_processed == 2048
+    assert job.rows_processed == 10
+    assert job.finished_at
+    assert not epc_jobs.get_active_job()
+
+
+def test_epc_import_job_failed():
+    models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING")).update(status="FAILED")
+    job = epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+
+    with unittest.mock.patch.object(epc_writer, "import_epc_ratings", side_effect=OSError("No space left")):
+        epc_jobs.run_worker(once=True)
+
+    job.refresh_from_db()
+    assert job.status == "FAILED", job.status
+    assert "No space left" in job.error
+
+
+def test_epc_import_heartbeat():
+    models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING")).update(status="FAILED")
+    job = epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+    long_ago = timezone.now() - epc_jobs.STALE_AFTER * 2
+    models.EpcImportJob.objects.filter(pk=job.pk).update(modified_at=long_ago)
+
+    with epc_jobs.Heartbeat(job, interval=0.01):
+        time.sleep(0.2)
+    job.refresh_from_db()
+    assert job.modified_at > long_ago
+    assert epc_jobs.get_active_job() == job
+    assert epc_jobs.fail_stale_jobs() == 0
+    models.EpcImportJob.objects.filter(pk=job.pk).update(status="FAILED")
+
+
+def test_epc_import_job_after_stale_pending_job():
+    models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING")).update(status="FAILED")
+    stale_job = epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+    long_ago = timezone.now() - epc_jobs.STALE_AFTER * 2
+    models.EpcImportJob.objects.filter(pk=stale_job.pk).update(modified_at=long_ago)
+
+    job = epc_jobs.create_job("https://example.com/epc_ratings.csv.bz2")
+
+    stale_job.refresh_from_db()
+    assert stale_job.status == "FAILED", stale_job.status
+    assert epc_jobs.get_active_job() == job
+    models.EpcImportJob.objects.filter(pk=job.pk).update(status="FAILED")
+
+
+def _get_index_names():
+    with connection.cursor() as cursor:
+        return sorted(name for name, _ in epc_writer.get_indexes(cursor, models.EpcRating._meta.db_table))
+
+
+def test_write_rows_full_refresh():
+    old_uprn = _make_uprn()
+    models.EpcRating.objects.create(uprn=old_uprn, rating="G", date=datetime.date(2019, 1, 1))
+    index_names = _get_index_names()
+    uprns = tuple(_make_uprn() for _ in range(5))
+    rows = tuple({"uprn": uprn, "epc_rating": "B", "date": "2021-01-01"} for uprn in uprns)
+    rows = rows + ({"uprn": uprns[0], "epc_rating": "E", "date": "2020-01-01"},)
+
+    total = epc_writer.write_rows_full_refresh(rows, batch_size=4)
+
+    assert total == 6, total
+    assert not models.EpcRating.objects.filter(uprn=old_uprn).exists()
+    assert models.EpcRating.objects.filter(uprn__in=uprns, rating="B").count() == 5
+    assert _get_index_names() == index_names
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relpersistence FROM pg_class WHERE relname = %s", [models.EpcRating._meta.db_table])
+        assert cursor.fetchone()[0] == "p"
+    with assert_raises(django.db.utils.IntegrityError):
+        with transaction.atomic():
+            models.EpcRating.objects.create(uprn=uprns[1], rating="A", date=datetime.date(2022, 1, 1))
+
+
+def test_undated_rows_dont_replace_dated_rows():
+    uprn, undated_uprn = _make_uprn(), _make_uprn()
+    rows = (
+        {"uprn": uprn, "epc_rating": "B", "date": "2021-01-01"},
+        {"uprn": uprn, "epc_rating": "G", "date": ""},
+        {"uprn": undated_uprn, "epc_rating": "F", "date": ""},
+    )
+
+    with connection.cursor() as cursor, transaction.atomic():
+        epc_writer.create_load_table(cursor)
+        epc_writer.upsert_batch(cursor, epc_writer.LOAD_TABLE, rows)
+    assert models.EpcRating.objects.get(uprn=uprn).rating == "B"
+
+    assert epc_writer.write_rows_full_refresh(rows + ({"uprn": "not-a-uprn", "epc_rating": "C", "date": ""},)) == 3
+    assert models.EpcRating.objects.get(uprn=uprn).rating == "B"
+    assert models.EpcRating.objects.get(uprn=undated_uprn).rating == "F"
+
+
+def _fake_download(content, chunk_size=7):
+    compressed = bz2.compress(content.encode("utf-8"))
+    chunks = tuple(compressed[i : i + chunk_size] for i in range(0, len(compressed), chunk_size))
+    return lambda url: (lambda: iter(chunks))
+
+
+def test_write_url_pipelined():
+    uprns = tuple(_make_uprn() for _ in range(4))
+    models.EpcRating.objects.create(uprn=uprns[3], rating="A", date=datetime.date(2022, 6, 1))
+    lines = (
+        "date,uprn,epc_rating",
+        f"2021-01-01,{uprns[0]},C",
+        f"2021-01-01,{uprns[1]},D",
+        f"2020-01-01,{uprns[0]},F",
+        f"2021-01-01,{uprns[2]},E",
+        f"2021-01-01,{uprns[3]},G",
+    )
+    content = "\n".join(lines) + "\n"
+
+    with unittest.mock.patch.object(epc_pipeline, "download", _fake_download(content)):
+        total = epc_pipeline.write_url_pipelined("https://example.com/epcs.csv.bz2", batch_size=2)
+
+    assert total == 5, total
+    ratings = dict(models.EpcRating.objects.filter(uprn__in=uprns).values_list("uprn", "rating"))
+    expected = {uprns[0]: "C", uprns[1]: "D", uprns[2]: "E", uprns[3]: "A"}
+    assert ratings == {int(uprn): rating for uprn, rating in expected.items()}, ratings
+
+
+def test_write_url_pipelined_prefers_dated_rows():
+    uprn = _make_uprn()
+    content = f"date,uprn,epc_rating\n2021-01-01,{uprn},B\n,{uprn},G\n"
+
+    with unittest.mock.patch.object(epc_pipeline, "download", _fake_download(content)):
+        epc_pipeline.write_url_pipelined("https://example.com/epcs.csv.bz2", batch_size=2)
+
+    epc = models.EpcRating.objects.get(uprn=uprn)
+    assert (epc.rating, epc.date) == ("B", datetime.date(2021, 1, 1)), (epc.rating, epc.date)
+
+
+def test_write_url_pipelined_error():
+    chunks = (b"not bzip2 data",)
+    with unittest.mock.patch.object(epc_pipeline, "download", lambda url: (lambda: iter(chunks))):
+        with assert_raises(OSError):
+            epc_pipeline.write_url_pipelined("https://example.com/epcs.csv.bz2")
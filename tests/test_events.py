@@ -0,0 +1,108 @@
+import datetime
+import unittest.mock
+import uuid
+
+from django.db import connection, transaction
+from django.test import override_settings
+from nose.tools import assert_raises
+
+from help_to_heat import utils
+from help_to_heat.frontdoor import event_partitions, interface
+from help_to_heat.frontdoor import models as frontdoor_models
+
+
+def _make_event(name):
+    return frontdoor_models.Event(name=name, data={"session_id": str(uuid.uuid4())})
+
+
+def test_event_buffer():
+    name = f"Buffered {uuid.uuid4()}"
+    event_buffer = utils.EventBuffer(max_size=3, max_age=60)
+    event_buffer.add(_make_event(name))
+    event_buffer.add(_make_event(name))
+    assert frontdoor_models.Event.objects.filter(name=name).count() == 0
+
+    event_buffer.add(_make_event(name))
+    assert frontdoor_models.Event.objects.filter(name=name).count() == 3
+
+    event_buffer.add(_make_event(name))
+    assert event_buffer.flush() == 1
+    assert frontdoor_models.Event.objects.filter(name=name).count() == 4
+    assert event_buffer.stats() == {"buffered": 4, "flushed": 4, "dropped": 0, "waiting": 0}, event_buffer.stats()
+
+
+def test_event_buffer_dropped():
+    event_buffer = utils.EventBuffer(max_size=10, max_age=60)
+    event_buffer.add(frontdoor_models.Event(name=None, data={}))
+    event_buffer.flush()
+    assert event_buffer.stats()["dropped"] == 1, event_buffer.stats()
+
+
+def test_event_buffer_reconnects():
+    name = f"Reconnected {uuid.uuid4()}"
+    event_buffer = utils.EventBuffer(max_size=10, max_age=60)
+    event_buffer.add(_make_event(name))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        (pid,) = cursor.fetchone()
+    other_connection = connection.copy()
+    try:
+        with other_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+    finally:
+        other_connection.close()
+
+    event_buffer.flush()
+    assert event_buffer.stats()["dropped"] == 0, event_buffer.stats()
+    assert frontdoor_models.Event.objects.filter(name=name).count() == 1
+
+
+@override_settings(EVENT_WRITE_MODE="BUFFERED")
+def test_buffered_register_event():
+    session_id = uuid.uuid4()
+    events = frontdoor_models.Event.objects.filter(data__session_id=str(session_id))
+
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    utils.event_buffer.flush()
+    assert events.count() == 1
+
+    with transaction.atomic():
+        interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+        transaction.set_rollback(True)
+    utils.event_buffer.flush()
+    assert events.count() == 1
+
+
+def test_event_partitions():
+    event_partitions.create_partitions(months_ahead=2)
+    this_month = datetime.date.today().replace(day=1)
+    with connection.cursor() as cursor:
+        partitions = event_partitions.get_partitions(cursor)
+    assert {event_partitions.add_months(this_month, months) for months in range(3)} <= set(partitions), partitions
+
+    old_month = event_partitions.add_months(this_month, -30)
+    event = _make_event(f"Old {uuid.uuid4()}")
+    event.save()
+    old_created_at = datetime.datetime(old_month.year, old_month.month, 2, tzinfo=datetime.timezone.utc)
+    frontdoor_models.Event.objects.filter(id=event.id).update(created_at=old_created_at)
+    with connection.cursor() as cursor:
+        name = event_partitions.create_partition(cursor, old_month)
+        cursor.execute(f"SELECT count(*) FROM {name} WHERE id = %s", [event.id])
+        assert cursor.fetchone()[0] == 1
+
+    cutoff, dropped = event_partitions.drop_partitions(retention_months=24)
+    assert name in [name for name, _, _ in dropped], dropped
+    assert not frontdoor_models.Event.objects.filter(id=event.id).exists()
+
+
+def test_partition_manager_keeps_running():
+    with unittest.mock.patch.object(
+        event_partitions, "manage_partitions", side_effect=[Exception("Already exists"), None]
+    ) as manage_partitions, unittest.mock.patch.object(
+        event_partitions.time, "sleep", side_effect=[None, KeyboardInterrupt]
+    ) as sleep:
+        with assert_raises(KeyboardInterrupt):
+            event_partitions.run_partition_manager(interval=60, months_ahead=2)
+    assert manage_partitions.call_count == 2
+    manage_partitions.assert_called_with(months_ahead=2)
+    sleep.assert_called_with(60)
@@ -42,7 +42,7 @@ def test_flow_northern_ireland():
     assert page.has_one("h1:contains('Where is the property located?')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_flow_scotland():
     client = utils.get_client()
     page = client.get("/")
@@ -188,7 +188,7 @@ def _answer_house_questions(page, session_id, benefits_answer, epc_rating="D"):
     return page
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_happy_flow():
     supplier = "EON"
     session_id = _do_happy_flow(supplier=supplier)
@@ -326,7 +326,7 @@ def test_back_button():
     assert form["country"] == "England"
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_no_benefits_flow():
     client = utils.get_client()
     page = client.get("/")
@@ -383,7 +383,7 @@ def test_no_benefits_flow():
     assert page.has_one("""h1:contains("It's likely that your home already has suitable energy saving measures")""")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_summary():
     client = utils.get_client()
     page = client.get("/")
@@ -415,7 +415,7 @@ def test_summary():
     assert page.has_text("10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.EmptyAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.EmptyAPI)
 def test_no_address():
     client = utils.get_client()
     page = client.get("/")
@@ -477,7 +477,7 @@ def test_no_address():
     assert page.has_one("h1:contains('What is the council tax band of your property?')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.EmptyAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.EmptyAPI)
 def test_no_epc():
     client = utils.get_client()
     page = client.get("/")
@@ -531,7 +531,7 @@ def test_no_epc():
     assert page.has_one("h1:contains('Is anyone in your household receiving any benefits?')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_eligibility():
     client = utils.get_client()
     page = client.get("/")
@@ -595,7 +595,7 @@ def test_eligibility():
     assert page.has_one("h1:contains('Your property is not eligible')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_referral_email():
     client = utils.get_client()
     page = client.get("/")
@@ -720,7 +720,7 @@ def test_feedback_with_session():
     assert page.has_one("h1:contains('Do you own the property?')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_incorrect_referral_email():
     client = utils.get_client()
     page = client.get("/")
@@ -764,7 +764,7 @@ def test_incorrect_referral_email():
     assert page.has_one("p:contains('Not a valid email address.')")
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_referral_not_providing_email():
     client = utils.get_client()
     page = client.get("/")
@@ -5,7 +5,7 @@ from . import utils
 from .test_frontdoor import _do_happy_flow
 
 
-@unittest.mock.patch("osdatahub.PlacesAPI", utils.StubAPI)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", utils.StubAPI)
 def test_csv():
     _do_happy_flow(supplier="OVO")
 
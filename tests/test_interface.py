@@ -1,12 +1,31 @@
 import datetime
+import pathlib
 import random
 import string
+import tempfile
+import unittest.mock
 import uuid
 
-from help_to_heat.frontdoor import interface
-from help_to_heat.portal import models
+import marshmallow
+from django.db import connection
+from django.test import override_settings
+from nose.tools import assert_raises
 
-from . import utils
+from help_to_heat.frontdoor import address_cache, answer_benchmark, interface
+from help_to_heat.frontdoor import models as frontdoor_models
+from help_to_heat.frontdoor import session_cache
+from help_to_heat.portal import epc_bloom, epc_snapshot, models
+
+from . import benchmarks, utils
+
+
+def test_with_schema_matches_uncached():
+    session_id = uuid.uuid4()
+    expected = benchmarks.Uncached().get_answer(session_id, "country")
+    assert benchmarks.Cached().get_answer(session_id, "country") == expected
+    assert benchmarks.Cached().get_answer(session_id=session_id, page_name="country") == expected
+    with assert_raises(marshmallow.ValidationError):
+        benchmarks.Cached().get_answer("not-a-session", "country")
 
 
 def test_answers():
@@ -46,12 +65,183 @@ def test_duplicate_answer():
     assert result == expected, (result, expected)
 
 
+OWNER = "Yes, I own my property and live in it"
+
+
+def test_get_session():
+    session_id = uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    interface.api.session.save_answer(session_id=session_id, page_name="own-property", data={"own_property": OWNER})
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+
+    result = interface.api.session.get_session(session_id=session_id)
+    expected = {"country": "Wales", "own_property": OWNER}
+    assert result == expected, (result, expected)
+    assert frontdoor_models.SessionState.objects.get(session_id=session_id).data == expected
+    assert frontdoor_models.Answer.objects.filter(session_id=session_id).count() == 3
+
+
+@override_settings(ANSWER_STORAGE_MODE="UPSERT", ANSWER_HISTORY=True)
+def test_upsert_answers():
+    session_id = uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    interface.api.session.save_answer(session_id=session_id, page_name="own-property", data={"own_property": OWNER})
+    result = interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+    assert result == {"country": "Wales"}, result
+
+    assert frontdoor_models.Answer.objects.filter(session_id=session_id).count() == 2
+    assert interface.api.session.get_answer(session_id=session_id, page_name="country") == {"country": "Wales"}
+    assert interface.fold_answers(session_id) == {"country": "Wales", "own_property": OWNER}
+    history = frontdoor_models.AnswerHistory.objects.filter(session_id=session_id)
+    assert [(h.page_name, h.data) for h in history] == [("country", {"country": "England"})]
+
+    with override_settings(ANSWER_HISTORY=False):
+        interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Scotland"})
+    assert history.count() == 1
+    assert interface.api.session.get_session(session_id=session_id)["country"] == "Scotland"
+
+
+def test_get_session_without_state():
+    session_id = uuid.uuid4()
+    frontdoor_models.Answer.objects.create(session_id=session_id, page_name="country", data={"country": "Scotland"})
+
+    result = interface.api.session.get_session(session_id=session_id)
+    assert result == {"country": "Scotland"}, result
+    assert frontdoor_models.SessionState.objects.get(session_id=session_id).data == {"country": "Scotland"}
+
+    assert interface.api.session.get_session(session_id=uuid.uuid4()) == {}
+
+
+def test_save_answer_without_state():
+    session_id = uuid.uuid4()
+    frontdoor_models.Answer.objects.create(session_id=session_id, page_name="country", data={"country": "England"})
+    frontdoor_models.Answer.objects.create(session_id=session_id, page_name="supplier", data={"supplier": "Utilita"})
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+    interface.api.session.save_answer(session_id=session_id, page_name="own-property", data={"own_property": OWNER})
+
+    expected = {"country": "Wales", "supplier": "Utilita", "own_property": OWNER}
+    assert frontdoor_models.SessionState.objects.get(session_id=session_id).data == expected
+    result = interface.api.session.get_session(session_id=session_id)
+    assert result == expected, (result, expected)
+
+
+def test_fold_answers_in_database():
+    session_id = uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    interface.api.session.save_answer(session_id=session_id, page_name="own-property", data={"own_property": OWNER})
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+    interface.api.session.save_answer(session_id=session_id, page_name="benefits", data={"schemes": ["ECO4", "GBIS"]})
+
+    expected = interface.fold_answers(session_id)
+    assert expected["country"] == "Wales", expected
+    with override_settings(ANSWER_FOLD_MODE="DATABASE"):
+        result = interface.fold_answers(session_id)
+        assert result == expected, (result, expected)
+        assert interface.fold_answers(uuid.uuid4()) == {}
+
+
+def test_get_sessions():
+    session_id, unstated_session_id, unknown_session_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+    frontdoor_models.Answer.objects.create(
+        session_id=unstated_session_id, page_name="country", data={"country": "Scotland"}
+    )
+
+    result = interface.api.session.get_sessions([session_id, unstated_session_id, unknown_session_id])
+    expected = {str(session_id): {"country": "England"}, str(unstated_session_id): {"country": "Scotland"}}
+    assert result == {"sessions": expected}, result
+    assert not frontdoor_models.SessionState.objects.filter(session_id=unstated_session_id).exists()
+
+
+def test_session_cache():
+    session_id = uuid.uuid4()
+    interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "England"})
+
+    with session_cache.activated() as cache:
+        session = interface.api.session.get_session(session_id)
+        session["country"] = "Narnia"
+        assert interface.api.session.get_session(str(session_id)) == {"country": "England"}
+        assert interface.api.session.get_answer(session_id, "country") == {"country": "England"}
+        assert interface.api.session.get_answer(session_id=session_id, page_name="country") == {"country": "England"}
+        assert (cache.hits, cache.misses) == (2, 2), (cache.hits, cache.misses)
+        assert cache.queries_saved == 2, cache.queries_saved
+
+        interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": "Wales"})
+        assert interface.api.session.get_session(session_id) == {"country": "Wales"}
+        assert cache.misses == 3, cache.misses
+
+
+def test_answer_benchmark():
+    answer_count = frontdoor_models.Answer.objects.count()
+    results = answer_benchmark.run(sessions=20, answers_per_session=3, samples=5)
+    assert set(results) == {"without indexes", "with indexes"}, results
+    assert results["with indexes"]["get_answer"]["p99_ms"] > 0
+    assert frontdoor_models.Answer.objects.count() == answer_count
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'frontdoor_answer'")
+        index_names = {name for (name,) in cursor.fetchall()}
+    assert {index.name for index in frontdoor_models.Answer._meta.indexes} <= index_names, index_names
+
+
 @utils.mock_os_api
 def test_find_addresses():
     result = interface.api.address.find_addresses("foobar")
     assert result[0]["uprn"] == "100023336956"
 
 
+class CountingAPI(utils.StubAPI):
+    calls = 0
+    uprn_calls = 0
+
+    def find(self, text, dataset=None, limit=None):
+        CountingAPI.calls += 1
+        return super().find(text, dataset=dataset, limit=limit)
+
+    def uprn(self, uprn, dataset=None):
+        CountingAPI.uprn_calls += 1
+        return super().uprn(uprn, dataset=dataset)
+
+
+@override_settings(ADDRESS_CACHE_SIZE=10, ADDRESS_CACHE_DATABASE=True)
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", CountingAPI)
+def test_address_cache():
+    cache = address_cache.address_cache
+    cache.clear()
+    line_1 = "".join(random.choices(string.ascii_lowercase, k=10))
+    CountingAPI.calls = 0
+    first = interface.api.address.find_addresses(f"{line_1}  sw1a 2aa")
+    assert interface.api.address.find_addresses(f"{line_1.upper()} SW1A\t2AA") == first
+    assert CountingAPI.calls == 1, CountingAPI.calls
+
+    cache.clear()
+    assert interface.api.address.find_addresses(f"{line_1} SW1A 2AA") == first
+    assert CountingAPI.calls == 1, CountingAPI.calls
+    assert frontdoor_models.AddressSearch.objects.filter(text=f"{line_1.upper()} SW1A 2AA").exists()
+
+    with override_settings(ADDRESS_CACHE_TTL=0, ADDRESS_CACHE_DATABASE=False):
+        interface.api.address.find_addresses(f"{line_1} SW1A 2AA")
+        interface.api.address.find_addresses(f"{line_1} SW1A 2AA")
+    assert CountingAPI.calls == 3, CountingAPI.calls
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["database_hits"]) >= (1, 1), stats
+
+
+@unittest.mock.patch("help_to_heat.frontdoor.os_places.get_client", CountingAPI)
+def test_select_address():
+    session_id = uuid.uuid4()
+    CountingAPI.uprn_calls = 0
+    results = interface.api.address.search_addresses(session_id, "10 Downing Street, SW1A 2AA")
+    assert len(results) == 10, results
+
+    result = interface.api.address.select_address(session_id, uprn=10033533595)
+    assert result == {"uprn": "10033533595", "address": "11, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AB"}
+    assert CountingAPI.uprn_calls == 0, CountingAPI.uprn_calls
+
+    result = interface.api.address.select_address(uuid.uuid4(), uprn=100023336956)
+    assert result["address"] == "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA", result
+    assert CountingAPI.uprn_calls == 1, CountingAPI.uprn_calls
+
+
 @utils.mock_os_api
 def test_get_address():
     result = interface.api.address.get_address(uprn="10")
@@ -73,3 +263,48 @@ def test_get_epc():
     new_uprn = "".join(random.choices(string.digits, k=5))
     missing_epc = interface.api.epc.get_epc(new_uprn)
     assert missing_epc == {}
+
+
+def test_get_epc_from_snapshot():
+    uprn = str(int("".join(random.choices(string.digits, k=12))))
+    models.EpcRating.objects.create(uprn=uprn, rating="E", date=datetime.date(2021, 3, 4))
+    models.EpcRating.objects.create(uprn="".join(random.choices(string.digits, k=12)), rating="B", date=None)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        snapshot_path = pathlib.Path(temp_dir) / "epc.snapshot"
+        count = epc_snapshot.build_snapshot(snapshot_path)
+        assert count == models.EpcRating.objects.count()
+
+        with override_settings(EPC_SNAPSHOT_PATH=str(snapshot_path)):
+            found_epc = interface.api.epc.get_epc(uprn)
+            assert found_epc == {"uprn": int(uprn), "rating": "E", "date": "2021-03-04"}, found_epc
+
+            models.EpcRating.objects.filter(uprn=uprn).delete()
+            assert interface.api.epc.get_epc(uprn)["rating"] == "E"
+
+            missing_uprn = "".join(random.choices(string.digits, k=13))
+            assert interface.api.epc.get_epc(missing_uprn) == {}
+
+
+def test_get_epc_with_bloom_filter():
+    uprn = str(int("".join(random.choices(string.digits, k=12))))
+    models.EpcRating.objects.create(uprn=uprn, rating="F", date=datetime.date(2021, 3, 4))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bloom_filter_path = pathlib.Path(temp_dir) / "epc.bloom"
+        bloom_filter = epc_bloom.build_bloom_filter(bloom_filter_path, 0.001)
+        assert bloom_filter.count == models.EpcRating.objects.count()
+        assert bloom_filter.estimated_false_positive_rate < 0.002
+
+        with override_settings(EPC_BLOOM_FILTER_PATH=str(bloom_filter_path)):
+            assert int(uprn) in epc_bloom.get_bloom_filter()
+            assert interface.api.epc.get_epc(uprn)["rating"] == "F"
+
+            missing_uprns = tuple(str(n) for n in range(999_999_000_000, 999_999_001_000))
+            false_positives = sum(uprn in epc_bloom.get_bloom_filter() for uprn in missing_uprns)
+            assert false_positives < 20, false_positives
+
+            unknown_uprn = next(uprn for uprn in missing_uprns if uprn not in epc_bloom.get_bloom_filter())
+            models.EpcRating.objects.create(uprn=unknown_uprn, rating="A", date=datetime.date(2021, 3, 4))
+            assert interface.api.epc.get_epc(unknown_uprn) == {}
+            models.EpcRating.objects.filter(uprn=unknown_uprn).delete()
@@ -0,0 +1,62 @@
+import requests
+import requests_mock
+from nose.tools import assert_raises
+
+from help_to_heat.frontdoor import os_places
+
+from . import utils
+
+FIND_URL = "https://api.os.uk/search/places/v1/find"
+UPRN_URL = "https://api.os.uk/search/places/v1/uprn"
+
+
+def get_client(**kwargs):
+    return os_places.PlacesClient("f4k3k3y", backoff=0, **kwargs)
+
+
+def test_find_and_uprn():
+    client = get_client()
+    with requests_mock.Mocker() as m:
+        m.get(FIND_URL, text=(utils.DATA_DIR / "sample_os_api_find_response.json").read_text())
+        m.get(UPRN_URL, text=(utils.DATA_DIR / "sample_os_api_uprn_response.json").read_text())
+        features = client.find("10 Downing Street", dataset="LPI", limit=10)["features"]
+        assert features[0]["properties"]["UPRN"] == "100023336956", features[0]
+        assert m.last_request.qs["maxresults"] == ["10"], m.last_request.qs
+        assert m.last_request.qs["dataset"] == ["lpi"], m.last_request.qs
+
+        features = client.uprn(100023336956, dataset="LPI")["features"]
+        address = features[0]["properties"]["ADDRESS"]
+        assert address == "10, DOWNING STREET, LONDON, CITY OF WESTMINSTER, SW1A 2AA", address
+
+        m.get(FIND_URL, json={"header": {}})
+        assert client.find("nowhere")["features"] == []
+    stats = client.stats()
+    assert (stats["requests"], stats["attempts"]) == (3, 3), stats
+
+
+def test_retries():
+    client = get_client(retries=2)
+    with requests_mock.Mocker() as m:
+        m.get(FIND_URL, [{"status_code": 503}, {"exc": requests.ConnectTimeout}, {"json": {"results": []}}])
+        assert client.find("10 Downing Street")["features"] == []
+        assert m.call_count == 3
+
+        m.get(FIND_URL, status_code=503)
+        with assert_raises(requests.HTTPError):
+            client.find("10 Downing Street")
+
+        m.get(FIND_URL, status_code=400)
+        with assert_raises(requests.HTTPError):
+            client.find("10 Downing Street")
+    stats = client.stats()
+    assert (stats["requests"], stats["attempts"], stats["retried"], stats["failures"]) == (3, 7, 4, 2), stats
+
+
+def test_concurrency_limit():
+    client = get_client(max_concurrency=1, connect_timeout=0.01, read_timeout=0.01)
+    client.slots.acquire()
+    with assert_raises(os_places.PlacesError):
+        client.find("10 Downing Street")
+    client.slots.release()
+    stats = client.stats()
+    assert (stats["requests"], stats["attempts"], stats["failures"]) == (1, 0, 1), stats
@@ -1,3 +1,7 @@
+import unittest.mock
+
+from help_to_heat.portal import models
+
 from . import utils
 
 
@@ -66,3 +70,33 @@ def test_service_manager_add_supplier():
     page = form.submit().follow()
 
     assert page.has_one(f"""th:contains("{team_lead_name} v2") ~ td:nth-of-type(2):contains("Disabled")""")
+
+
+@unittest.mock.patch("subprocess.Popen")
+def test_epc_upload(popen):
+    models.EpcImportJob.objects.filter(status__in=("PENDING", "RUNNING")).update(status="FAILED")
+    client = utils.get_client()
+    utils.login_as_service_manager(client)
+    page = client.get("/portal/epc-upload/")
+    form = page.get_form()
+    form["url"] = "https://example.com/epc_ratings.csv.bz2"
+    page = form.submit().follow()
+    assert page.has_text("Upload started")
+    assert page.has_text("Pending")
+    assert popen.call_count == 1
+
+    form = page.get_form()
+    form["url"] = "https://example.com/epc_ratings.csv.bz2"
+    page = form.submit().follow()
+    assert page.has_text("An upload is already in progress")
+    assert popen.call_count == 1
+
+    models.EpcImportJob.objects.filter(status="PENDING").update(status="FAILED")
+
+
+def test_epc_upload_requires_service_manager():
+    client = utils.get_client()
+    for url in ("/portal/epc-upload/", "/portal/epc-upload/status/"):
+        page = client.get(url)
+        assert page.status_code == 302, page.status_code
+        assert "unauthorised" in page.headers["Location"], page.headers
@@ -0,0 +1,108 @@
+import random
+import unittest.mock
+
+import marshmallow
+
+from help_to_heat.frontdoor import schemas
+
+VALID_SESSION = {
+    "country": "England",
+    "own_property": "Yes, I own my property and live in it",
+    "address_line_1": "10 Downing Street",
+    "postcode": "SW1A 2AA",
+    "uprn": 100023336956,
+    "epc_rating": "D",
+    "benefits": "Yes",
+    "property_type": "House",
+    "email": "",
+    "schemes": ["ECO4", "GBIS"],
+}
+
+CASES = (
+    VALID_SESSION,
+    {},
+    {"country": "Narnia"},
+    {"country": None},
+    {"country": 7},
+    {"country": b"England"},
+    {"address_line_1": ["not", "a", "string"]},
+    {"uprn": "100023336956"},
+    {"uprn": "not a number"},
+    {"email": None},
+    {"email": "not an email"},
+    {"email": "someone@example.com"},
+    {"schemes": "ECO4"},
+    {"schemes": ["ECO4", 4]},
+    {"floob": "blumble", "country": "Wales"},
+    {"floob": "blumble", "country": "Atlantis"},
+    ["not", "a", "dict"],
+    "not a dict",
+    None,
+)
+
+
+def _outcome(func, *args, **kwargs):
+    try:
+        return ("ok", func(*args, **kwargs))
+    except marshmallow.ValidationError as e:
+        return ("error", e.messages, e.valid_data)
+    except (TypeError, ValueError) as e:
+        return ("exception", type(e), str(e))
+
+
+def _random_value(field_name):
+    field = schemas.SessionSchema._declared_fields[field_name]
+    choices = [validator.choices for validator in field.validators if isinstance(validator, marshmallow.validate.OneOf)]
+    options = [None, 12, "", "random text", ["a list"], {"a": "dict"}]
+    if choices:
+        options.extend(choices[0])
+    return random.choice(options)
+
+
+def test_compiled_session_schema_load_matches():
+    for unknown in (marshmallow.RAISE, marshmallow.EXCLUDE, marshmallow.INCLUDE):
+        for case in CASES:
+            expected = _outcome(schemas.SessionSchema(unknown=unknown).load, case)
+            result = _outcome(schemas.CompiledSessionSchema(unknown=unknown).load, case)
+            assert result == expected, (unknown, case, result, expected)
+
+
+def test_compiled_session_schema_load_matches_random():
+    rng_state = random.getstate()
+    random.seed(2023)
+    try:
+        field_names = list(schemas.SessionSchema._declared_fields) + ["unknown_field"]
+        for _ in range(500):
+            case = {name: _random_value(name) for name in random.sample(field_names[:-1], k=random.randint(0, 8))}
+            if random.random() < 0.2:
+                case["unknown_field"] = "value"
+            for unknown in (marshmallow.RAISE, marshmallow.EXCLUDE):
+                expected = _outcome(schemas.SessionSchema(unknown=unknown).load, case)
+                result = _outcome(schemas.CompiledSessionSchema(unknown=unknown).load, case)
+                assert result == expected, (unknown, case, result, expected)
+    finally:
+        random.setstate(rng_state)
+
+
+def test_compiled_session_schema_dump_matches():
+    for case in CASES + ({"uprn": "12"}, {"country": None}, {"address_line_1": 12}):
+        expected = _outcome(schemas.SessionSchema().dump, case)
+        result = _outcome(schemas.CompiledSessionSchema().dump, case)
+        assert result == expected, (case, result, expected)
+
+
+def test_compiled_session_schema_many_and_partial():
+    cases = [VALID_SESSION, {"country": "Narnia"}]
+    assert _outcome(schemas.CompiledSessionSchema(many=True).load, cases) == _outcome(
+        schemas.SessionSchema(many=True).load, cases
+    )
+    assert schemas.CompiledSessionSchema().dump(cases, many=True) == schemas.SessionSchema().dump(cases, many=True)
+    assert schemas.CompiledSessionSchema(partial=True).load(VALID_SESSION) == VALID_SESSION
+
+
+def test_compiled_session_schema_uses_fast_path():
+    schema = schemas.CompiledSessionSchema()
+    with unittest.mock.patch.object(schemas.SessionSchema, "load", side_effect=AssertionError("slow path")):
+        assert schema.load(VALID_SESSION) == VALID_SESSION
+    with unittest.mock.patch.object(schemas.SessionSchema, "dump", side_effect=AssertionError("slow path")):
+        assert schema.dump(VALID_SESSION) == VALID_SESSION
@@ -0,0 +1,86 @@
+import datetime
+import gzip
+import json
+import pathlib
+import tempfile
+import uuid
+
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from help_to_heat.frontdoor import interface
+from help_to_heat.frontdoor import models as frontdoor_models
+from help_to_heat.frontdoor import session_purge
+from help_to_heat.portal import models
+
+
+def _make_session(days_ago):
+    session_id = uuid.uuid4()
+    for country in ("England", "Wales", "Scotland"):
+        interface.api.session.save_answer(session_id=session_id, page_name="country", data={"country": country})
+    answered_at = timezone.now() - datetime.timedelta(days=days_ago)
+    frontdoor_models.Answer.objects.filter(session_id=session_id).update(created_at=answered_at)
+    frontdoor_models.SessionState.objects.filter(session_id=session_id).update(modified_at=answered_at)
+    frontdoor_models.Event.objects.filter(data__session_id=str(session_id)).update(created_at=answered_at)
+    return session_id
+
+
+def _session_rows(session_id):
+    return (
+        frontdoor_models.Answer.objects.filter(session_id=session_id).count(),
+        frontdoor_models.SessionState.objects.filter(session_id=session_id).count(),
+        frontdoor_models.Event.objects.filter(data__session_id=str(session_id)).count(),
+    )
+
+
+def test_purge_sessions():
+    abandoned_session_id = _make_session(days_ago=40)
+    referred_session_id = _make_session(days_ago=40)
+    models.Referral.objects.create(session_id=referred_session_id, data={})
+    active_session_id = _make_session(days_ago=1)
+    assert _session_rows(abandoned_session_id) == (3, 1, 3), _session_rows(abandoned_session_id)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = pathlib.Path(temp_dir) / "answers.jsonl.gz"
+        stats = session_purge.purge_sessions(ttl_days=30, chunk_size=2, archive_path=archive_path)
+        with gzip.open(archive_path, "rt") as f:
+            archived = [json.loads(line) for line in f]
+
+    assert _session_rows(abandoned_session_id) == (0, 0, 0), _session_rows(abandoned_session_id)
+    assert _session_rows(referred_session_id) == (3, 1, 3)
+    assert _session_rows(active_session_id) == (3, 1, 3)
+    archived_countries = sorted(a["data"]["country"] for a in archived if a["session_id"] == str(abandoned_session_id))
+    assert archived_countries == ["England", "Scotland", "Wales"], archived
+    assert stats.sessions >= 1
+    assert stats.bytes_freed > 0
+
+
+def test_purge_address_searches():
+    fresh_text, expired_text = f"FRESH {uuid.uuid4()}", f"EXPIRED {uuid.uuid4()}"
+    frontdoor_models.AddressSearch.objects.create(text=fresh_text, results=[])
+    frontdoor_models.AddressSearch.objects.create(text=expired_text, results=[])
+    expired_at = timezone.now() - datetime.timedelta(days=2)
+    frontdoor_models.AddressSearch.objects.filter(text=expired_text).update(modified_at=expired_at)
+
+    with override_settings(ADDRESS_CACHE_TTL=24 * 60 * 60):
+        session_purge.purge_sessions(ttl_days=30)
+
+    assert frontdoor_models.AddressSearch.objects.filter(text=fresh_text).exists()
+    assert not frontdoor_models.AddressSearch.objects.filter(text=expired_text).exists()
+
+
+def test_purge_chunk_carries_on_after_key():
+    older_session_id = _make_session(days_ago=45)
+    session_id = _make_session(days_ago=40)
+    answered_at = frontdoor_models.Answer.objects.filter(session_id=session_id).first().created_at
+    cutoff = timezone.now() - datetime.timedelta(days=30)
+    after = (answered_at - datetime.timedelta(microseconds=1), uuid.UUID(int=0))
+
+    with connection.cursor() as cursor, transaction.atomic():
+        purged, after = session_purge.purge_chunk(cursor, cutoff, 100, session_purge.PurgeStats(), after=after)
+
+    assert purged >= 3
+    assert after[0] >= answered_at
+    assert _session_rows(session_id) == (0, 0, 0), _session_rows(session_id)
+    assert _session_rows(older_session_id) == (3, 1, 3), _session_rows(older_session_id)
@@ -28,10 +28,10 @@ class StubAPI:
         "uprn": "sample_osdatahub_uprn_response.json",
     }
 
-    def __init__(self, key):
+    def __init__(self, key=None):
         self.key = key
 
-    def find(self, text, dataset=None):
+    def find(self, text, dataset=None, limit=None):
         content = (DATA_DIR / self.files["find"]).read_text()
         data = json.loads(content)
         return data